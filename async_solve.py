@@ -0,0 +1,71 @@
+# CISC 352 - W22
+# async_solve.py
+# desc: asyncio entry points to the solvers, so that a service can run
+#       many solves in one event loop without blocking it.
+#
+
+'''Two ways to solve without blocking the event loop:
+
+   compiled_solve_async runs the compiled engine (see compiled.py) in
+   the event loop itself, in cooperative slices: after every slice of
+   slice_time seconds (or slice_nodes decisions) it yields to the loop,
+   so cheap solves finish quickly while expensive ones share the loop.
+   It returns what solve_model returns, a dict variable name -> value or
+   None.
+
+       model = compile_csp(csp)      #once, shared by all requests
+       solution = await compiled_solve_async(model, givens={'Cell(1,1)': 3})
+
+   bt_search_async runs BT.bt_search in an executor (a thread by
+   default) and returns its status. Each search running at the same time
+   needs its own CSP, since the search state lives in the Variables.
+
+       solver = BT(csp)
+       status = await bt_search_async(solver, prop_GAC, ord_dom_wdeg)
+
+   Both stop when their task is cancelled: the compiled search simply
+   is not resumed, and a BT search is told to stop (BT.cancel) and
+   waited for before CancelledError is raised, so the CSP is never left
+   in the middle of a search.
+'''
+
+import asyncio
+import functools
+
+from cspbase import *
+from compiled import *
+
+async def compiled_solve_async(model, givens=None, prop='GAC', var_ord='mrv',
+                               slice_time=0.005, slice_nodes=None):
+    '''Solve model (a CompiledCSP, or a CSP compiled on the spot) under
+       givens in cooperative slices. Returns a dict variable name ->
+       value, or None if there is no solution.'''
+    if not isinstance(model, CompiledCSP):
+        model = compile_csp(model)
+    search = CompiledSearch(model, prop, var_ord, givens)
+    while True:
+        status = search.run(slice_nodes, slice_time)
+        if status is not None:
+            break
+        await asyncio.sleep(0)
+    if not status:
+        return None
+    return dict(zip(model.names, model.decode(search.values())))
+
+async def bt_search_async(solver, propagator, var_ord=None, val_ord=None, executor=None, **options):
+    '''Run solver.bt_search(propagator, var_ord, val_ord, **options) in
+       executor (None for the loop's default thread pool) and return its
+       status'''
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, functools.partial(
+        solver.bt_search, propagator, var_ord, val_ord, **options))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if not future.done():
+            solver.cancel()
+        await asyncio.wait([future])
+        #a cancel that came after the search finished must not stop the next one
+        solver.cancelled = False
+        solver.set_limits(solver.max_decisions, solver.time_limit)
+        raise
@@ -0,0 +1,243 @@
+# CISC 352 - W22
+# benchmark.py
+# desc: benchmarks the solvers on the sample problems and Cagey models.
+#       Every problem and size is solved with every combination of
+#       propagator and heuristic, and the results are written as JSON.
+#       A saved result file can serve as baseline for later runs.
+#
+#   python benchmark.py --out baseline.json
+#   python benchmark.py --baseline baseline.json --out new.json
+#   python benchmark.py --compare baseline.json new.json --threshold 0.25
+#
+
+'''Each run records (see run_case):
+       status       'solved', 'unsat' or 'timeout' (--time-limit per run)
+       build_time   seconds to build the model
+       wall, cpu    seconds of bt_search (best of --repeat runs)
+       decisions    variable assignments made
+       prunings     values pruned
+       model_memory bytes allocated by the model
+       peak_memory  peak bytes allocated during bt_search
+   The memory figures come from an extra run under tracemalloc, which
+   slows Python down too much to be timed; runs that time out are
+   neither repeated nor measured for memory.
+
+   The variable orderings are those of cagey_batch plus the learning
+   ones of heuristics.py ('impact', 'activity'), which get a fresh
+   monitor for every run so that repeated runs stay comparable.
+
+   compare_results flags a case as regressed when its status got worse,
+   or its wall/cpu time, decisions, prunings or peak memory grew by more
+   than the threshold (a fraction, 0.25 = 25%), and reports baseline
+   cases missing from the current run. Times below min_time seconds are
+   too noisy to compare and are ignored.
+'''
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from cspbase import *
+from propagators import *
+from heuristics import *
+from cagey_csp import binary_ne_grid, nary_ad_grid, cagey_csp_model
+from cagey_gen import generate_board
+from cagey_batch import PROPAGATORS, VAR_ORDERS as STATIC_ORDERS
+from csp_sample_run import nQueens, australiaPaint
+
+# learning orderings: name -> SearchMonitor class providing var_ord
+MONITORED_ORDERS = {'impact': ImpactHeuristic, 'activity': ActivityHeuristic}
+VAR_ORDERS = dict(STATIC_ORDERS)
+VAR_ORDERS.update((name, None) for name in MONITORED_ORDERS)
+VAL_ORDERS = {'none': None, 'lcv': val_lcv}
+STATUS = {True: 'solved', False: 'unsat', None: 'timeout'}
+TIMED = ['wall', 'cpu']
+COUNTED = ['decisions', 'prunings', 'peak_memory']
+
+def build_queens(size, seed):
+    return nQueens(size)
+
+def build_australia(size, seed):
+    return australiaPaint()
+
+def build_ne_grid(size, seed):
+    return binary_ne_grid(generate_board(size, seed)[0])[0]
+
+def build_ad_grid(size, seed):
+    return nary_ad_grid(generate_board(size, seed)[0])[0]
+
+def build_cagey(size, seed):
+    return cagey_csp_model(generate_board(size, seed)[0])[0]
+
+# problem -> (builder(size, seed) returning a CSP, default sizes)
+PROBLEMS = {
+    'queens': (build_queens, [6, 8, 10, 12]),
+    'australia': (build_australia, [7]),
+    'ne_grid': (build_ne_grid, [4, 5, 6]),
+    'ad_grid': (build_ad_grid, [3, 4, 5]),   # n! constraints per row/column
+    'cagey': (build_cagey, [4, 5, 6]),
+}
+
+def solve_once(builder, size, seed, prop, var_ord, val_ord, time_limit, memory=False):
+    '''Build the model and solve it once; return a dict of measurements'''
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    csp = builder(size, seed)
+    build_time = time.perf_counter() - start
+
+    result = {'build_time': build_time}
+    if memory:
+        result['model_memory'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    solver = BT(csp)
+    solver.quiet_on()
+    solver.set_limits(time_limit=time_limit)
+    order = VAR_ORDERS[var_ord]
+    if var_ord in MONITORED_ORDERS:
+        monitor = MONITORED_ORDERS[var_ord]()
+        solver.add_monitor(monitor)
+        order = monitor.var_ord
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    status = solver.bt_search(PROPAGATORS[prop], order, VAL_ORDERS[val_ord])
+    result['cpu'] = time.process_time() - cpu
+    result['wall'] = time.perf_counter() - wall
+
+    if memory:
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1] - result['model_memory']
+        tracemalloc.stop()
+    result.update({'status': STATUS[status], 'decisions': solver.nDecisions,
+                   'prunings': solver.nPrunings})
+    return result
+
+def run_case(problem, size, prop, var_ord, val_ord, seed=0, repeat=3, time_limit=5, memory=True):
+    '''Benchmark one combination; return its result dict'''
+    builder = PROBLEMS[problem][0]
+    case = {'problem': problem, 'size': size, 'seed': seed,
+            'prop': prop, 'var_ord': var_ord, 'val_ord': val_ord}
+    result = solve_once(builder, size, seed, prop, var_ord, val_ord, time_limit)
+    if result['status'] != 'timeout':
+        for i in range(repeat - 1):
+            again = solve_once(builder, size, seed, prop, var_ord, val_ord, time_limit)
+            for key in TIMED + ['build_time']:
+                result[key] = min(result[key], again[key])
+    if memory and result['status'] != 'timeout':
+        traced = solve_once(builder, size, seed, prop, var_ord, val_ord, time_limit, memory=True)
+        result['model_memory'] = traced['model_memory']
+        result['peak_memory'] = traced['peak_memory']
+    case.update(result)
+    return case
+
+def run_suite(problems=None, sizes=None, props=None, var_orders=None, val_orders=None,
+              seed=0, repeat=3, time_limit=5, memory=True, log=None):
+    '''Benchmark every combination; return the results document'''
+    results = []
+    for problem in problems or sorted(PROBLEMS):
+        for size in sizes or PROBLEMS[problem][1]:
+            for prop in props or sorted(PROPAGATORS):
+                for var_ord in var_orders or sorted(VAR_ORDERS):
+                    for val_ord in val_orders or ['none']:
+                        case = run_case(problem, size, prop, var_ord, val_ord, seed,
+                                        repeat, time_limit, memory)
+                        results.append(case)
+                        if log:
+                            log.write("{problem:9} {size:3} {prop:3} {var_ord:8} {val_ord:4} "
+                                      "{status:7} {wall:9.4f}s {decisions:9}\n".format(**case))
+                            log.flush()
+    meta = {'python': platform.python_version(), 'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'repeat': repeat,
+            'time_limit': time_limit}
+    return {'meta': meta, 'results': results}
+
+def case_key(case):
+    return (case['problem'], case['size'], case['seed'], case['prop'],
+            case['var_ord'], case['val_ord'])
+
+def compare_results(baseline, current, threshold=0.25, min_time=0.005):
+    '''Compare two results documents. Returns a list of
+       (case key, metric, baseline value, current value) regressions; a
+       baseline case the current run lacks is reported with metric
+       'missing' and current value None.'''
+    before = dict((case_key(c), c) for c in baseline['results'])
+    after = set(case_key(c) for c in current['results'])
+    regressions = [(key, 'missing', before[key]['status'], None)
+                   for key in sorted(before, key=str) if not key in after]
+    for case in current['results']:
+        key = case_key(case)
+        if not key in before:
+            continue
+        old = before[key]
+        if old['status'] != case['status'] and old['status'] != 'timeout':
+            regressions.append((key, 'status', old['status'], case['status']))
+            continue
+        if case['status'] == 'timeout':
+            continue
+        for metric in TIMED:
+            if case[metric] > max(old[metric] * (1 + threshold), min_time):
+                regressions.append((key, metric, old[metric], case[metric]))
+        for metric in COUNTED:
+            if metric in old and metric in case and case[metric] > old[metric] * (1 + threshold):
+                regressions.append((key, metric, old[metric], case[metric]))
+    return regressions
+
+def report(regressions, out=sys.stdout):
+    '''Print the regressions found by compare_results'''
+    if not regressions:
+        out.write("No regressions\n")
+    for key, metric, old, new in regressions:
+        out.write("REGRESSION {} {}: {} -> {}\n".format(
+            ' '.join(str(k) for k in key), metric, old, new))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the CSP solvers.')
+    parser.add_argument('--problems', nargs='+', choices=sorted(PROBLEMS))
+    parser.add_argument('--sizes', type=int, nargs='+', help='override the default sizes')
+    parser.add_argument('--props', nargs='+', choices=sorted(PROPAGATORS))
+    parser.add_argument('--var-orders', nargs='+', choices=sorted(VAR_ORDERS))
+    parser.add_argument('--val-orders', nargs='+', choices=sorted(VAL_ORDERS))
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated boards')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case (best is kept)')
+    parser.add_argument('--time-limit', type=float, default=5, help='seconds of search per run')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--out', help='write the results here (default stdout)')
+    parser.add_argument('--baseline', help='results file to compare this run against')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='only compare two saved results files')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative growth')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions = compare_results(baseline, current, args.threshold)
+        report(regressions)
+        return 1 if regressions else 0
+
+    results = run_suite(args.problems, args.sizes, args.props, args.var_orders, args.val_orders,
+                        args.seed, args.repeat, args.time_limit, not args.no_memory, sys.stderr)
+    text = json.dumps(results, indent=1)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.threshold)
+        report(regressions, sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
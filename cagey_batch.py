@@ -0,0 +1,171 @@
+# CISC 352 - W22
+# cagey_batch.py
+# desc: solves batches of Cagey boards in a process pool.
+#       Boards are read as JSON lines and one JSON line of results is
+#       written per board, in the order the boards finish.
+#
+#   python cagey_batch.py [-i boards.jsonl] [-o results.jsonl] [--workers N]
+#                         [--prop FC] [--var-ord dom_wdeg]
+#                         [--time-limit SECONDS] [--max-decisions N]
+#
+
+'''Each input line holds one board, either in the (n, [cages]) format
+   used by cagey_csp_model written as JSON, e.g.
+
+       [3, [[3, [[1,1], [2,1]], "+"], [1, [[1,2]], "?"], ...]]
+
+   or as an object carrying an id for the caller:
+
+       {"id": "b17", "board": [3, [[3, [[1,1], [2,1]], "+"], ...]]}
+
+   Lines without an id are numbered from 0 in input order. Each output
+   line is an object:
+
+       {"id": ..., "status": "solved" | "unsat" | "timeout" | "error",
+        "grid": [[row 1 values], ...], "ops": [cage operators],
+        "decisions": ..., "prunings": ...,
+        "build_time": ..., "solve_time": ...}
+
+   grid/ops are null unless the board was solved, and "error" results
+   carry an "error" message instead.
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from cspbase import *
+from cagey_csp import *
+from propagators import *
+from heuristics import *
+
+PROPAGATORS = {'BT': prop_BT, 'FC': prop_FC, 'GAC': prop_GAC}
+VAR_ORDERS = {'none': None, 'mrv': ord_mrv, 'dh': ord_dh, 'dom_ddeg': ord_dom_ddeg,
+              'dom_wdeg': ord_dom_wdeg}
+
+def board_from_json(obj):
+    '''Convert a JSON board [n, [[v, [[r,c], ...], op], ...]] to the
+       (n, [(v, [(r,c), ...], op), ...]) format of cagey_csp_model'''
+    n, cages = obj
+    return (n, [(v, [tuple(cell) for cell in cells], op) for v, cells, op in cages])
+
+def board_to_json(board):
+    '''Inverse of board_from_json'''
+    n, cages = board
+    return [n, [[v, [list(cell) for cell in cells], op] for v, cells, op in cages]]
+
+def solve_board(board, prop='FC', var_ord='none', time_limit=None, max_decisions=None):
+    '''Build and solve one board, returning a result dict (without id)'''
+    start = time.perf_counter()
+    csp, var_array = cagey_csp_model(board)
+    build_time = time.perf_counter() - start
+
+    solver = BT(csp)
+    solver.quiet_on()
+    solver.set_limits(max_decisions, time_limit)
+    start = time.perf_counter()
+    status = solver.bt_search(PROPAGATORS[prop], VAR_ORDERS[var_ord])
+    solve_time = time.perf_counter() - start
+
+    n = board[0]
+    result = {'status': {True: 'solved', False: 'unsat', None: 'timeout'}[status],
+              'grid': None, 'ops': None,
+              'decisions': solver.nDecisions, 'prunings': solver.nPrunings,
+              'build_time': build_time, 'solve_time': solve_time}
+    if status:
+        values = [var.get_assigned_value() for var in var_array]
+        result['grid'] = [values[row*n:(row+1)*n] for row in range(n)]
+        result['ops'] = values[n*n:]
+    return result
+
+def solve_line(board_id, obj, options):
+    '''Worker entry point: solve one parsed input line'''
+    result = {'id': board_id}
+    try:
+        result.update(solve_board(board_from_json(obj), **options))
+    except Exception as e:
+        result.update({'status': 'error', 'error': '{}: {}'.format(type(e).__name__, e)})
+    return result
+
+def read_boards(stream):
+    '''Yield (id, board json, error) for every non-blank line of stream.
+       error is None, or a message if the line is not valid JSON or has
+       no board; board json is then None.'''
+    count = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        board_id = count
+        try:
+            obj = json.loads(line)
+            if isinstance(obj, dict):
+                board_id = obj.get('id', count)
+                obj = obj['board']
+        except Exception as e:
+            yield board_id, None, '{}: {}'.format(type(e).__name__, e)
+        else:
+            yield board_id, obj, None
+        count += 1
+
+def solve_stream(instream, outstream, workers=None, **options):
+    '''Solve every board of instream in a pool of worker processes and
+       write one JSON result line per board to outstream as soon as it
+       is done. Only a few boards per worker are read ahead, so arbitrarily
+       long streams can be processed. Returns the number of boards processed.'''
+    workers = workers or os.cpu_count() or 1
+    boards = read_boards(instream)
+    pending = set()
+    count = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < 2 * workers:
+                try:
+                    board_id, obj, error = next(boards)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if error is not None:
+                    #unreadable line: report it and carry on with the rest
+                    outstream.write(json.dumps({'id': board_id, 'status': 'error',
+                                                'error': error}) + '\n')
+                    count += 1
+                    continue
+                pending.add(pool.submit(solve_line, board_id, obj, options))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                outstream.write(json.dumps(future.result()) + '\n')
+                count += 1
+            outstream.flush()
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve a JSONL stream of Cagey boards.')
+    parser.add_argument('-i', '--input', help='boards file (default stdin)')
+    parser.add_argument('-o', '--output', help='results file (default stdout)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--prop', choices=sorted(PROPAGATORS), default='FC')
+    parser.add_argument('--var-ord', choices=sorted(VAR_ORDERS), default='none')
+    parser.add_argument('--time-limit', type=float, default=None, help='seconds of search per board')
+    parser.add_argument('--max-decisions', type=int, default=None, help='assignments per board')
+    args = parser.parse_args(argv)
+
+    instream = open(args.input) if args.input else sys.stdin
+    outstream = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        solve_stream(instream, outstream, args.workers, prop=args.prop, var_ord=args.var_ord,
+                     time_limit=args.time_limit, max_decisions=args.max_decisions)
+    finally:
+        if args.input:
+            instream.close()
+        if args.output:
+            outstream.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# CISC 352 - W22
+# cagey_bitmask.py
+# desc: a specialised solver for Cagey boards. Instead of the generic
+#       Variable/Constraint tables it keeps one n-bit candidate mask per
+#       cell and reasons directly about rows, columns and cages.
+#
+
+'''Boards use the (n, [cages]) format of cagey_csp_model, and the solution
+   is returned as a var_array with exactly the same layout (and variable
+   names) as cagey_csp_model's: the n^2 cells row by row, then one cage
+   operator variable per cage. For example
+
+       solver = CageyBitmask(board)
+       if solver.solve():
+           print([var.get_assigned_value() for var in solver.var_array])
+
+   Value v is bit (v-1) of a mask. Propagation repeats until nothing changes:
+     - naked singles: a cell with one candidate removes it from its row
+       and column
+     - hidden singles: a value with one possible cell in a row or column
+       is placed there (and a value with none is a deadend)
+     - cages: the cage's satisfying tuples (cagey_csp.cage_tuples) are
+       filtered against the candidates, and every cell keeps only the
+       values some remaining tuple gives it
+   Search branches on the cell with the fewest candidates, copying the
+   masks and remaining cage tuples at each level.
+'''
+
+from cspbase import *
+from cagey_csp import cage_tuples, cagey_check, coord_to_index, CAGE_OPS
+
+class CageyBitmask:
+
+    def __init__(self, cagey_grid):
+        n = cagey_grid[0]
+        self.n = n
+        self.board = cagey_grid
+        self.full = (1 << n) - 1
+        self.popcount = [bin(m).count("1") for m in range(1 << n)]
+        self.nDecisions = 0
+        self.var_array = None
+
+        size = n * n
+        self.units = [[r*n + c for c in range(n)] for r in range(n)] + \
+                     [[r*n + c for r in range(n)] for c in range(n)]
+        self.peers = []
+        for i in range(size):
+            r, c = divmod(i, n)
+            self.peers.append([r*n + k for k in range(n) if k != c] +
+                              [k*n + c for k in range(n) if k != r])
+
+        # each cage: (cell indices, tuples of value bits, one per position)
+        self.cages = []
+        for target, cells, op in cagey_grid[1]:
+            index = [coord_to_index(cell, n) for cell in cells]
+            tuples = set()
+            for t in cage_tuples(target, op, cells, n):
+                tuples.add(tuple(1 << (v-1) for v in t[:-1]))
+            self.cages.append((index, list(tuples)))
+
+    def solve(self):
+        '''Search for a solution. Returns True and fills var_array if one
+           exists, False otherwise.'''
+        self.nDecisions = 0
+        self.var_array = None
+        cand = [self.full] * (self.n * self.n)
+        live = [tuples for index, tuples in self.cages]
+        result = self.search(cand, live)
+        if result is None:
+            return False
+        self.var_array = self.build_var_array(result)
+        return True
+
+    def search(self, cand, live):
+        '''Depth first search; returns the solved masks or None'''
+        if not self.propagate(cand, live):
+            return None
+        best = None
+        best_count = self.n + 1
+        for i, m in enumerate(cand):
+            count = self.popcount[m]
+            if 1 < count < best_count:
+                best = i
+                best_count = count
+        if best is None:
+            return cand
+        m = cand[best]
+        while m:
+            bit = m & -m
+            m ^= bit
+            self.nDecisions += 1
+            child = list(cand)
+            child[best] = bit
+            result = self.search(child, list(live))
+            if result is not None:
+                return result
+        return None
+
+    def propagate(self, cand, live):
+        '''Apply the single and cage rules to a fixpoint. Returns False
+           on a deadend.'''
+        popcount = self.popcount
+        changed = True
+        while changed:
+            changed = False
+
+            # naked singles
+            for i, m in enumerate(cand):
+                if m == 0:
+                    return False
+                if popcount[m] == 1:
+                    for p in self.peers[i]:
+                        if cand[p] & m:
+                            cand[p] &= ~m
+                            if cand[p] == 0:
+                                return False
+                            changed = True
+
+            # hidden singles
+            for unit in self.units:
+                once = 0
+                twice = 0
+                for i in unit:
+                    twice |= once & cand[i]
+                    once |= cand[i]
+                if once != self.full:
+                    return False
+                singles = once & ~twice
+                if singles:
+                    for i in unit:
+                        bit = cand[i] & singles
+                        if bit and cand[i] != bit:
+                            if popcount[bit] > 1:
+                                return False
+                            cand[i] = bit
+                            changed = True
+
+            # cages
+            for k, (index, tuples) in enumerate(self.cages):
+                kept = []
+                support = [0] * len(index)
+                for t in live[k]:
+                    for p, i in enumerate(index):
+                        if not cand[i] & t[p]:
+                            break
+                    else:
+                        kept.append(t)
+                        for p in range(len(index)):
+                            support[p] |= t[p]
+                if not kept:
+                    return False
+                live[k] = kept
+                for p, i in enumerate(index):
+                    if cand[i] & ~support[p]:
+                        cand[i] &= support[p]
+                        changed = True
+        return True
+
+    def build_var_array(self, cand):
+        '''Return the solution as Variables laid out like cagey_csp_model'''
+        n = self.n
+        dom = list(range(1, n+1))
+        var_array = []
+        for r in range(1, n+1):
+            for c in range(1, n+1):
+                var = Variable('Cell({},{})'.format(r, c), dom)
+                var.assign(cand[coord_to_index((r, c), n)].bit_length())
+                var_array.append(var)
+        for target, cells, operator in self.board[1]:
+            in_cage = [var_array[coord_to_index(cell, n)] for cell in cells]
+            cage_oper = Variable(f'Cage_op({target}:{operator}:{in_cage})', ["+","-","*","/","?"])
+            vals = [var.get_assigned_value() for var in in_cage]
+            op = operator
+            if operator == "?" and len(cells) > 1:
+                op = [o for o in CAGE_OPS if cagey_check(target, vals + [o])][0]
+            cage_oper.assign(op)
+            var_array.append(cage_oper)
+        return var_array
+
+def bitmask_solve(cagey_grid):
+    '''Solve a Cagey board with CageyBitmask; return its var_array, or None
+       if the board has no solution'''
+    solver = CageyBitmask(cagey_grid)
+    if solver.solve():
+        return solver.var_array
+    return None
@@ -92,6 +92,7 @@ An example of a 3x3 puzzle would be defined as:
 '''
 
 from cspbase import *
+from propagators import prop_GAC
 import itertools # allowed, said on OnQ
 
 """
@@ -103,10 +104,66 @@ Thinking process
  Step 5: create csp object
  Step 6: return csp and var_array
 """
-def binary_ne_grid(cagey_grid):
+def add_latin_channeling(csp, var_arr, n):
+    """
+    Add the redundant "every value appears in every row and column"
+    constraints of a Latin grid by channeling into position variables:
+    Pos(Row r,v) is the column holding value v in row r (Pos(Col c,v) the
+    row holding v in column c), tied to the cells by binary constraints
+    Pos(Row r,v) == c  <=>  Cell(r,c) == v.
+    Once v has a single possible place in a row its position variable is
+    fixed and the channel forces the cell (hidden single reasoning).
+    The position variables are appended to var_arr after the cells.
+    """
+    for line in ("Row", "Col"):
+        for i in range(1, n+1):
+            for v in range(1, n+1):
+                pos = Variable("Pos({}{},{})".format(line, i, v), list(range(1, n+1)))
+                csp.add_var(pos)
+                var_arr.append(pos)
+                for j in range(1, n+1):
+                    if line == "Row":
+                        cell = var_arr[coord_to_index((i, j), n)]
+                    else:
+                        cell = var_arr[coord_to_index((j, i), n)]
+                    con = Constraint("Chan({},{})".format(pos.name, cell.name), [pos, cell])
+                    sat_tuples = []
+                    for t in itertools.product(pos.domain(), cell.domain()):
+                        if (t[0] == j) == (t[1] == v):
+                            sat_tuples.append(t)
+                    con.add_satisfying_tuples(sat_tuples)
+                    csp.add_constraint(con)
+
+def add_latin_symmetry_breaking(csp, var_arr, n):
+    """
+    Break the symmetries of an otherwise unconstrained Latin grid: values
+    can be renamed, so the first row is fixed to 1..n, and rows 2..n can
+    then be permuted, so the first column must increase downwards. Only
+    sound when nothing else (e.g. a cage) tells values or rows apart.
+    """
+    for col in range(1, n+1):
+        cell = var_arr[coord_to_index((1, col), n)]
+        con = Constraint("Sym({})".format(cell.name), [cell])
+        con.add_satisfying_tuples([(col,)])
+        csp.add_constraint(con)
+    for row in range(2, n):
+        upper = var_arr[coord_to_index((row, 1), n)]
+        lower = var_arr[coord_to_index((row+1, 1), n)]
+        con = Constraint("Sym({}<{})".format(upper.name, lower.name), [upper, lower])
+        sat_tuples = []
+        for t in itertools.product(upper.domain(), lower.domain()):
+            if t[0] < t[1]:
+                sat_tuples.append(t)
+        con.add_satisfying_tuples(sat_tuples)
+        csp.add_constraint(con)
+
+def binary_ne_grid(cagey_grid, redundant=False, symmetry_breaking=False, cell_doms=None):
     """
     Desc: A model of a Cagey grid (without cage constraints) built using only
       binary not-equal constraints for both the row and column constraints.
+      redundant adds the channeling constraints of add_latin_channeling and
+      symmetry_breaking those of add_latin_symmetry_breaking. cell_doms
+      optionally gives each cell (in var_arr order) a smaller domain than 1..n.
     Return a Cagey grid CSP object and its variable array
     """
     n = cagey_grid[0] # n x n grid
@@ -119,7 +176,10 @@ def binary_ne_grid(cagey_grid):
     var_arr = []
     for t in itertools.product(dom,dom):
         # to match desired cell names
-        var_arr.append(Variable('Cell({},{})'.format(t[0],t[1]), dom))
+        if cell_doms:
+            var_arr.append(Variable('Cell({},{})'.format(t[0],t[1]), cell_doms[len(var_arr)]))
+        else:
+            var_arr.append(Variable('Cell({},{})'.format(t[0],t[1]), dom))
 
     # Step 3
     cons = []
@@ -131,12 +191,11 @@ def binary_ne_grid(cagey_grid):
     Example: 3 x 3 grid, row 1: C1 C2 C3
     binary constraints: C1≠C2, C1≠C3, C2≠C3
     """
-    varDoms = [list(range(1,n+1)),list(range(1,n+1))] # for satisfying tuples
-    
     for row in range(n): # num of rows
         for rcell in itertools.combinations(range(n), 2):
             con = Constraint("C(Row{}-(C{},C{})".format(row+1,rcell[0]+1,rcell[1]+1),
                              [var_arr[row*n+rcell[0]],var_arr[row*n+rcell[1]]])
+            varDoms = [v.domain() for v in con.scope] # for satisfying tuples
             sat_tuples = []
             for t in itertools.product(*varDoms):
                 if t[0] != t[1]:
@@ -154,6 +213,7 @@ def binary_ne_grid(cagey_grid):
     for col in range(n): # num of rows
         for ccell in itertools.combinations(range(n), 2):
             con = Constraint("C(Col{}-(C{},C{})".format(col+1,ccell[0]+1,ccell[1]+1),[var_arr[col+ccell[0]*n],var_arr[col+ccell[1]*n]])
+            varDoms = [v.domain() for v in con.scope]
             sat_tuples = []
             for t in itertools.product(*varDoms):
                 if t[0] != t[1]:
@@ -165,13 +225,18 @@ def binary_ne_grid(cagey_grid):
     csp = CSP("{}x{}-BinaryGrid".format(n,n), var_arr)
     for c in cons:
         csp.add_constraint(c)
+    if redundant:
+        add_latin_channeling(csp, var_arr, n)
+    if symmetry_breaking:
+        add_latin_symmetry_breaking(csp, var_arr, n)
     return csp, var_arr # Step 6
     
         
-def nary_ad_grid(cagey_grid):
+def nary_ad_grid(cagey_grid, redundant=False, symmetry_breaking=False):
     """
     Desc: A model of a Cagey grid (without cage constraints) built using only n-ary
       all-different constraints for both the row and column constraints.
+      redundant and symmetry_breaking as for binary_ne_grid.
     Return a Cagey grid CSP object and its variable array
     """
     n = cagey_grid[0] # n x n grid
@@ -230,6 +295,10 @@ def nary_ad_grid(cagey_grid):
     csp = CSP("{}x{}-N-naryGrid".format(n,n), var_arr)
     for c in cons:
         csp.add_constraint(c)
+    if redundant:
+        add_latin_channeling(csp, var_arr, n)
+    if symmetry_breaking:
+        add_latin_symmetry_breaking(csp, var_arr, n)
     return csp, var_arr # Step 6
 
 def coord_to_index(coordinate, n):
@@ -282,10 +351,163 @@ def cagey_check(target, operands):
 ##print("1, [5,6], '-' is ", cagey_check(1, [5,6], '-'))
 ##print("4, [16,2,2], '/' is ", cagey_check(4, [16,2,2], '/'))
 
-def cagey_csp_model(cagey_grid):
+CAGE_OPS = ["+","-","*","/"] # operators tried for '?' cages
+
+# memoized cage tables, keyed on (target, operator, cage size, n, shape)
+cage_table_cache = dict()
+
+def cage_shape(cells):
+    """
+    Return the pairs of cage positions (i, j), i < j, whose cells share a
+    row or a column. Such cells can never hold equal values.
+    """
+    shape = []
+    for i, j in itertools.combinations(range(len(cells)), 2):
+        if cells[i][0] == cells[j][0] or cells[i][1] == cells[j][1]:
+            shape.append((i, j))
+    return tuple(shape)
+
+def cage_values(target, operator, k, n, shape):
+    """
+    Enumerate the value lists (one value in 1..n per cage position) that
+    cagey_check accepts for target and operator, directly instead of
+    filtering all n^k combinations:
+        '+' compositions of target, bounded by the remaining positions
+        '*' factorizations of target
+        '-' the other positions freely, then the first one is forced
+            (|c1 - (c2+...+ck)| == target gives c1 = sum +/- target)
+        '/' the other positions, then c1 = target * (c2*...*ck)
+    Positions paired in shape (see cage_shape) never take equal values.
+    """
+    if k == 1:
+        if 1 <= target <= n:
+            yield [target]
+        return
+
+    # '-' and '/' fix the first position last
+    if operator in ("-", "/"):
+        order = list(range(1, k)) + [0]
+    else:
+        order = list(range(k))
+    pairs = set(shape)
+    clashes = []
+    for s, p in enumerate(order):
+        clashes.append([q for q in order[:s] if (min(p, q), max(p, q)) in pairs])
+
+    vals = [0] * k
+
+    def candidates(s, acc):
+        rem = k - s - 1 # positions still to fill after this one
+        if operator == "+":
+            if rem == 0:
+                return [target - acc]
+            return range(max(1, target - acc - rem * n), min(n, target - acc - rem) + 1)
+        if operator == "*":
+            if rem == 0:
+                return [target // acc] if target % acc == 0 else []
+            return [v for v in range(1, n + 1) if target % (acc * v) == 0]
+        if operator == "-":
+            if rem == 0:
+                return sorted(set([acc + target, acc - target]))
+            return range(1, min(n, n + target - acc - (rem - 1)) + 1)
+        if operator == "/":
+            if rem == 0:
+                return [target * acc]
+            return range(1, n // (target * acc) + 1) if target > 0 else []
+        return []
+
+    def extend(s, acc):
+        p = order[s]
+        for v in candidates(s, acc):
+            if v < 1 or v > n:
+                continue
+            if any(vals[q] == v for q in clashes[s]):
+                continue
+            vals[p] = v
+            if s == k - 1:
+                yield list(vals)
+            elif operator in ("*", "/"):
+                yield from extend(s + 1, acc * v)
+            else:
+                yield from extend(s + 1, acc + v)
+
+    yield from extend(0, 1 if operator in ("*", "/") else 0)
+
+def cage_tuples(target, operator, cells, n):
+    """
+    Return the satisfying tuples of a cage constraint: the cell values
+    followed by the cage operator, exactly as accepted by cagey_check
+    (for '?' cages of more than one cell, every operator in CAGE_OPS is
+    tried). Tuples putting equal values in cells of the same row/column
+    are left out. Results are memoized on the target, operator, cage size,
+    grid size and row/column shape of the cage, so the returned list is
+    shared and must not be modified.
+    """
+    shape = cage_shape(cells)
+    key = (target, operator, len(cells), n, shape)
+    if key in cage_table_cache:
+        return cage_table_cache[key]
+
+    if operator != "?" or len(cells) == 1:
+        ops = [operator]
+    else:
+        ops = CAGE_OPS
+    sat_tuples = []
+    for op in ops:
+        for vals in cage_values(target, op, len(cells), n, shape):
+            sat_tuples.append(tuple(vals) + (op,))
+    cage_table_cache[key] = sat_tuples
+    return sat_tuples
+
+def prune_cell_domains(cagey_grid, tables):
+    """
+    Root-level pruning of the cell domains of a Cagey board, given the
+    satisfying tuples of each cage (in board order). Every cage table is
+    projected onto its cells, tuples using removed values are dropped, and
+    a cell left with a single value (e.g. in a one-cell cage) removes it
+    from its row and column; this repeats until nothing changes.
+    Return the cell domains (sorted lists, in var_arr order) and the
+    filtered tables.
+    """
+    n = cagey_grid[0]
+    doms = [set(range(1, n+1)) for i in range(n*n)]
+    cages = [[coord_to_index(cell, n) for cell in cage[1]] for cage in cagey_grid[1]]
+    tables = list(tables)
+    changed = True
+    while changed:
+        changed = False
+        for k, cells in enumerate(cages):
+            live = [t for t in tables[k] if all(t[p] in doms[i] for p, i in enumerate(cells))]
+            if len(live) != len(tables[k]):
+                tables[k] = live
+            for p, i in enumerate(cells):
+                used = set(t[p] for t in live)
+                if not doms[i] <= used:
+                    doms[i] &= used
+                    changed = True
+        for i in range(n*n):
+            if len(doms[i]) == 1:
+                val = next(iter(doms[i]))
+                row, col = divmod(i, n)
+                for peer in [row*n + c for c in range(n)] + [r*n + col for r in range(n)]:
+                    if peer != i and val in doms[peer]:
+                        doms[peer].discard(val)
+                        changed = True
+        if not all(doms):
+            break
+    return [sorted(d) for d in doms], tables
+
+def cagey_csp_model(cagey_grid, redundant=False, symmetry_breaking=False, prune_domains=False):
     """
     Desc: a model of a Cagey grid built using choice (1) binary not-equal
           constraints for the grid, together with Cagey cage constraints.
+          redundant adds the row/column channeling constraints of
+          add_latin_channeling (their position variables come before the
+          cage operator variables in var_arr). symmetry_breaking is only
+          applied to boards without cages, as any cage can tell values
+          and rows apart. prune_domains shrinks the cell domains up front
+          with prune_cell_domains (one-cell cages become fixed values), so
+          every table of the model is built over the smaller domains.
 
     Reason: for faster computation in terms of number of constraints
         For n x n grid
@@ -297,8 +519,14 @@ def cagey_csp_model(cagey_grid):
         which means num of binary < num of n-ary constraints
     """
     n = cagey_grid[0] # n x n grid
+    tables = [cage_tuples(cage[0], cage[2], cage[1], n) for cage in cagey_grid[1]]
+    cell_doms = None
+    if prune_domains:
+        cell_doms, tables = prune_cell_domains(cagey_grid, tables)
     #csp, var_arr = nary_ad_grid((cagey_grid[0],[])) # from n-ary function above
-    csp, var_arr = binary_ne_grid((cagey_grid[0],[])) # from binary function above
+    csp, var_arr = binary_ne_grid((cagey_grid[0],[]), redundant,
+                                  symmetry_breaking and not cagey_grid[1],
+                                  cell_doms) # from binary function above
     
     # Consider Cagey cage
     for count, cage in enumerate(cagey_grid[1]):
@@ -321,28 +549,38 @@ def cagey_csp_model(cagey_grid):
         
         # Add satisfying tuples based on the constraints
         cage_oper.assign(operator) # assign operator value as given
-        
-        varDoms = []
-        for v in varlist:
-            varDoms.append(v.cur_domain()) # since we select specific operator
-
-        sat_tuples = []
-        if (operator != "?") or (len(in_cage) == 1):
-            for t in itertools.product(*varDoms):
-                if cagey_check(target, t):
-                    sat_tuples.append(t)
-            con.add_satisfying_tuples(sat_tuples)
-        else: # which mean it is ?
-            trys = ["+","-","*","/"]
-            for oper in trys:
-                varDoms[-1] = oper
-                for t in itertools.product(*varDoms):
-                    if cagey_check(target, t):
-                        sat_tuples.append(t)
-            con.add_satisfying_tuples(sat_tuples)
+        con.add_satisfying_tuples(tables[count])
                 
         # Add cage var and constraints to the csp Object
         var_arr.append(cage_oper)
         csp.add_constraint(con)
     
     return csp, var_arr
+
+def cagey_unique(cagey_grid, propagator=prop_GAC, var_ord=None, max_decisions=None,
+                 time_limit=None, **options):
+    """
+    Check whether a Cagey board has exactly one solution, e.g. to validate
+    generated puzzles. The board is modelled with cagey_csp_model (options
+    are passed on to it) and solved in a single search that keeps going
+    after the first solution, so the first solution's branch is simply
+    backtracked out of with all propagation state intact, and that stops
+    at a second one. Solutions are told apart by their cells only, as a
+    '?' cage can be satisfied by more than one operator.
+    Return (True/False, [grid, ...]) with at most two grids, each listing
+    the cell values in var_array order. max_decisions and time_limit
+    bound the search (see BT.set_limits); the first item is None if it
+    ran out of budget before telling.
+    """
+    n = cagey_grid[0]
+    csp, var_arr = cagey_csp_model(cagey_grid, **options)
+    solver = BT(csp)
+    solver.quiet_on()
+    solver.set_limits(max_decisions, time_limit)
+    status = solver.bt_search(propagator, var_ord, max_solutions=2, distinct_on=var_arr[:n*n])
+
+    index = dict((var, i) for i, var in enumerate(csp.vars))
+    grids = [[sol[index[var]] for var in var_arr[:n*n]] for sol in solver.solutions]
+    if status is None and len(grids) < 2:
+        return None, grids
+    return len(grids) == 1, grids
@@ -0,0 +1,173 @@
+# CISC 352 - W22
+# cagey_gen.py
+# desc: generates random Cagey boards for benchmarking.
+#       A random Latin square is split into cages and each cage gets an
+#       operator and the value it produces on the square, so every board
+#       has at least that square as a solution. Boards are deterministic
+#       for a given seed.
+#
+#   python cagey_gen.py --sizes 4 5 6 --count 10 --seed 1 > boards.jsonl
+#
+
+import argparse
+import json
+import random
+import sys
+
+from cagey_csp import cagey_check, cagey_unique
+from cagey_batch import board_to_json
+
+DEFAULT_CAGE_SIZES = {1: 1, 2: 4, 3: 3, 4: 1}         # cage size -> weight
+DEFAULT_OPS = {'+': 3, '-': 2, '*': 3, '/': 1, '?': 1}  # operator -> weight
+
+def latin_square(n, rng, moves=None):
+    '''Return a random n x n Latin square over 1..n as a list of rows.
+       Starting from the cyclic square, a Jacobson-Matthews random walk of
+       moves steps (n**3 by default) is taken over the incidence cube
+       (cube[r][c][s] == 1 iff cell (r, c) holds s); it mixes towards the
+       uniform distribution over all Latin squares, not just the
+       row/column/symbol permutations of the cyclic one.'''
+    if n < 2:
+        return [[1]] * n
+    cube = [[[1 if (r + c) % n == s else 0 for s in range(n)] for c in range(n)]
+            for r in range(n)]
+    moves = n ** 3 if moves is None else moves
+    improper = None     #the cell at -1 while the cube is not a Latin square
+    step = 0
+    while step < moves or improper is not None:
+        if improper is None:
+            while True:
+                r, c, s = rng.randrange(n), rng.randrange(n), rng.randrange(n)
+                if cube[r][c][s] == 0:
+                    break
+            r1 = next(x for x in range(n) if cube[x][c][s] == 1)
+            c1 = next(y for y in range(n) if cube[r][y][s] == 1)
+            s1 = next(z for z in range(n) if cube[r][c][z] == 1)
+            step += 1
+        else:
+            #every line through the -1 cell holds two 1s; pick one of each
+            r, c, s = improper
+            r1 = rng.choice([x for x in range(n) if cube[x][c][s] == 1])
+            c1 = rng.choice([y for y in range(n) if cube[r][y][s] == 1])
+            s1 = rng.choice([z for z in range(n) if cube[r][c][z] == 1])
+        for x, y, z in ((r, c, s), (r, c1, s1), (r1, c, s1), (r1, c1, s)):
+            cube[x][y][z] += 1
+        for x, y, z in ((r, c, s1), (r, c1, s), (r1, c, s), (r1, c1, s1)):
+            cube[x][y][z] -= 1
+        improper = (r1, c1, s1) if cube[r1][c1][s1] < 0 else None
+    return [[cube[r][c].index(1) + 1 for c in range(n)] for r in range(n)]
+
+def weighted_choice(weights, rng):
+    '''Pick a key of weights (a dict key -> weight)'''
+    keys = sorted(weights)
+    return rng.choices(keys, [weights[k] for k in keys])[0]
+
+def partition_cages(n, rng, sizes=DEFAULT_CAGE_SIZES):
+    '''Split the n x n grid into connected cages whose sizes are drawn
+       from sizes (cage size -> weight). A cage that cannot grow to its
+       drawn size is kept smaller. Returns lists of (row, col) cells.'''
+    free = set((r, c) for r in range(1, n+1) for c in range(1, n+1))
+    order = sorted(free)
+    rng.shuffle(order)
+    cages = []
+    for cell in order:
+        if cell not in free:
+            continue
+        size = weighted_choice(sizes, rng)
+        cage = [cell]
+        free.remove(cell)
+        while len(cage) < size:
+            border = sorted(set((r + dr, c + dc) for r, c in cage
+                                for dr, dc in ((1, 0), (-1, 0), (0, 1), (0, -1))) & free)
+            if not border:
+                break
+            nxt = rng.choice(border)
+            cage.append(nxt)
+            free.remove(nxt)
+        cages.append(cage)
+    return cages
+
+def cage_clue(cells, square, rng, ops=DEFAULT_OPS):
+    '''Choose an operator for a cage of square and return the cage
+       (value, cells, op). The cells are reordered largest value first so
+       that '-' and '/' read as in cagey_check; '/' is only used when it
+       divides exactly. '?' hides one of the other operators. When no
+       operator of ops applies to the cage, '+' is used.'''
+    cells = sorted(cells, key=lambda cell: -square[cell[0]-1][cell[1]-1])
+    vals = [square[r-1][c-1] for r, c in cells]
+    if len(cells) == 1:
+        return (vals[0], cells, weighted_choice(ops, rng))
+
+    rest = 1
+    for v in vals[1:]:
+        rest *= v
+    usable = dict((op, w) for op, w in ops.items()
+                  if w > 0 and (op != '/' or vals[0] % rest == 0))
+    op = weighted_choice(usable, rng) if usable else '+'
+    hidden = op
+    if op == '?':
+        shown = dict((o, w) for o, w in usable.items() if o != '?')
+        hidden = weighted_choice(shown, rng) if shown else '+'
+
+    if hidden == '+':
+        value = sum(vals)
+    elif hidden == '*':
+        value = vals[0] * rest
+    elif hidden == '-':
+        value = abs(vals[0] - sum(vals[1:]))
+    else:
+        value = vals[0] // rest
+    assert cagey_check(value, vals + [hidden])
+    return (value, cells, op)
+
+def generate_board(n, seed, sizes=DEFAULT_CAGE_SIZES, ops=DEFAULT_OPS, unique=False, tries=100):
+    '''Return (board, square): a Cagey board in the (n, [cages]) format of
+       cagey_csp_model together with the Latin square it was built from.
+       With unique, boards are drawn until one has a single solution (see
+       cagey_unique), giving up with a ValueError after tries boards.
+       The same arguments always give the same board.'''
+    rng = random.Random('{}-{}'.format(n, seed))
+    for attempt in range(tries):
+        square = latin_square(n, rng)
+        cages = [cage_clue(cells, square, rng, ops) for cells in partition_cages(n, rng, sizes)]
+        if not unique or cagey_unique((n, cages))[0]:
+            return (n, cages), square
+    raise ValueError('no board with a unique solution in {} tries'.format(tries))
+
+def generate_boards(sizes, count, seed=0, cage_sizes=DEFAULT_CAGE_SIZES, ops=DEFAULT_OPS, unique=False):
+    '''Yield (id, board, square) for count boards of every grid size in sizes'''
+    for n in sizes:
+        for i in range(count):
+            board, square = generate_board(n, seed * 1000003 + i, cage_sizes, ops, unique)
+            yield 'n{}-s{}-{}'.format(n, seed, i), board, square
+
+def parse_weights(text, convert):
+    '''Parse "k:w,k:w" into a dict, e.g. "2:4,3:3" or "+:3,?:1"'''
+    weights = dict()
+    for item in text.split(','):
+        key, weight = item.rsplit(':', 1)
+        weights[convert(key)] = float(weight)
+    return weights
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate random Cagey boards as JSON lines.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 5, 6, 7, 8, 9])
+    parser.add_argument('--count', type=int, default=10, help='boards per grid size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cage-sizes', default=None, help='cage size weights, e.g. "1:1,2:4,3:3,4:1"')
+    parser.add_argument('--ops', default=None, help='operator weights, e.g. "+:3,-:2,*:3,/:1,?:1"')
+    parser.add_argument('--unique', action='store_true', help='only boards with a single solution')
+    parser.add_argument('--with-solution', action='store_true', help='include the generating square')
+    args = parser.parse_args(argv)
+
+    cage_sizes = parse_weights(args.cage_sizes, int) if args.cage_sizes else DEFAULT_CAGE_SIZES
+    ops = parse_weights(args.ops, str) if args.ops else DEFAULT_OPS
+    for board_id, board, square in generate_boards(args.sizes, args.count, args.seed, cage_sizes, ops,
+                                                     args.unique):
+        line = {'id': board_id, 'board': board_to_json(board)}
+        if args.with_solution:
+            line['solution'] = square
+        sys.stdout.write(json.dumps(line) + '\n')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+# CISC 352 - W22
+# compiled.py
+# desc: compiles a built CSP into a flat, integer indexed form and
+#       searches it with an iterative backtracking engine. Variables
+#       and values become dense integer ids, current domains become bit
+#       masks and constraints become tables of code tuples, so the inner
+#       loops never hash Variable objects. The compiled model is never
+#       changed after construction, so any number of searches (in
+#       threads or asyncio tasks) can share it; each keeps its own
+#       SearchState.
+#
+
+'''Usage:
+
+       compiled = compile_csp(csp)
+       search = CompiledSearch(compiled, prop='GAC', var_ord='mrv')
+       if search.run():
+           print(compiled.decode(search.values()))
+
+   or simply compiled_solve(csp, 'GAC'), which assigns the csp's
+   Variables like bt_search does. To answer many queries against one
+   model, compile it once and call
+
+       solution = solve_model(compiled, givens={'Cell(1,1)': 3})
+
+   from as many threads as needed: it returns a dict variable name ->
+   value, or None, and touches neither the model nor the Variables.
+
+   Encoding: variable i is csp.vars[i] and value code a of variable i is
+   csp.vars[i].dom[a]. A current domain is a mask with bit a set when
+   code a is in it; an assigned variable has a single bit. For every
+   constraint the compiled form keeps
+       scopes[c]      tuple of variable ids
+       bin_sup[c]     for binary constraints, bin_sup[c][i][a] is the
+                      mask of codes of the other variable compatible
+                      with code a at position i; None otherwise
+       sat[c]         for other constraints, the frozenset of satisfying
+                      code tuples; None for binary ones
+       supports[c]    for other constraints, supports[c][i][a] is the
+                      tuple of satisfying code tuples with code a at
+                      scope position i; None for binary ones
+   and for every variable var_cons[v], its (constraint, position) pairs,
+   and neighbours[v], the ids of the variables it shares a constraint
+   with.
+
+   Everything a search changes lives in its SearchState: the current
+   domain masks, the assigned codes and an undo trail of (variable, old
+   mask) entries. Givens (variable -> value, variables given by name or
+   Variable) restrict the initial masks of one state without affecting
+   the model or other searches.
+
+   CompiledSearch keeps an explicit stack instead of recursing. run(max_nodes) returns
+   True at a solution, False when the search space is exhausted and None
+   when it paused after max_nodes decisions; calling run again resumes,
+   so after a solution it goes on to the next one.
+'''
+
+import time
+
+from cspbase import *
+
+class CompiledCSP:
+
+    def __init__(self, csp):
+        '''Encode csp; see compile_csp'''
+        self.name = csp.name
+        self.vars = tuple(csp.vars)
+        self.ids = dict((v, i) for i, v in enumerate(self.vars))
+        self.ids.update((v.name, i) for i, v in enumerate(self.vars))
+        self.names = tuple(v.name for v in self.vars)
+        self.domains = tuple(tuple(v.dom) for v in self.vars)
+        self.codes = tuple(dict(v.codes) for v in self.vars)
+        self.dom_size = tuple(len(d) for d in self.domains)
+
+        #like bt_search, start from the full domains with nothing assigned
+        self.masks = tuple((1 << size) - 1 for size in self.dom_size)
+
+        con_names = []
+        scopes = []
+        sats = []
+        all_supports = []
+        all_bin_sup = []
+        var_cons = [[] for v in self.vars]
+        for c in csp.cons:
+            k = len(con_names)
+            scope = tuple(self.ids[v] for v in c.scope)
+            sat = None
+            supports = None
+            bin_sup = None
+            if len(scope) == 2:
+                bin_sup = ([0] * self.dom_size[scope[0]], [0] * self.dom_size[scope[1]])
+                for a, b in c.code_tuples():
+                    bin_sup[0][a] |= 1 << b
+                    bin_sup[1][b] |= 1 << a
+                bin_sup = (tuple(bin_sup[0]), tuple(bin_sup[1]))
+            else:
+                table = list(c.code_tuples())
+                sat = frozenset(table)
+                supports = [[[] for a in range(self.dom_size[v])] for v in scope]
+                for t in table:
+                    for i, a in enumerate(t):
+                        supports[i][a].append(t)
+                supports = tuple(tuple(tuple(ts) for ts in s) for s in supports)
+
+            con_names.append(c.name)
+            scopes.append(scope)
+            sats.append(sat)
+            all_supports.append(supports)
+            all_bin_sup.append(bin_sup)
+            for i, v in enumerate(scope):
+                var_cons[v].append((k, i))
+
+        self.con_names = tuple(con_names)
+        self.scopes = tuple(scopes)
+        self.sat = tuple(sats)
+        self.supports = tuple(all_supports)
+        self.bin_sup = tuple(all_bin_sup)
+        self.var_cons = tuple(tuple(vc) for vc in var_cons)
+
+        neighbours = []
+        for v in range(len(self.vars)):
+            ns = set()
+            for k, i in self.var_cons[v]:
+                ns.update(self.scopes[k])
+            ns.discard(v)
+            neighbours.append(tuple(sorted(ns)))
+        self.neighbours = tuple(neighbours)
+
+    def holds(self, k, t):
+        '''True if the code tuple t satisfies constraint k'''
+        if self.bin_sup[k] is not None:
+            return self.bin_sup[k][0][t[0]] >> t[1] & 1 == 1
+        return t in self.sat[k]
+
+    def decode(self, values):
+        '''Return a list of values (in csp.vars order) for a list of codes'''
+        return [self.domains[v][a] for v, a in enumerate(values)]
+
+    def var_id(self, var):
+        '''Return the id of var, given as a Variable, its name or its id'''
+        if isinstance(var, int):
+            return var
+        return self.ids[var]
+
+def compile_csp(csp):
+    '''Freeze a built CSP into a CompiledCSP. As in bt_search, the
+       variables' current domains and assignments are ignored, and later
+       changes to csp are not seen by the compiled form.'''
+    return CompiledCSP(csp)
+
+class SearchState:
+
+    def __init__(self, model, givens=None):
+        '''The mutable part of a search of model: the current domain
+           masks, the assigned codes and the undo trail. givens is a dict
+           variable -> value restricting the initial domains; a value
+           outside its variable's domain empties it.'''
+        self.model = model
+        self.dom = list(model.masks)
+        self.val = [-1] * len(model.vars)
+        self.trail = []
+        if givens:
+            for var, value in givens.items():
+                v = model.var_id(var)
+                a = model.codes[v].get(value)
+                self.dom[v] = 0 if a is None else self.dom[v] & (1 << a)
+
+    def mark(self):
+        '''Return a mark to undo back to (a snapshot costing nothing;
+           undo takes time proportional to the changes since)'''
+        return len(self.trail)
+
+    def fork(self):
+        '''Return an independent copy of this state, e.g. to explore a
+           subtree elsewhere. Only the domain masks and codes are copied;
+           the model is shared and the copy starts with an empty trail.'''
+        state = SearchState.__new__(SearchState)
+        state.model = self.model
+        state.dom = list(self.dom)
+        state.val = list(self.val)
+        state.trail = []
+        return state
+
+    def set_dom(self, v, mask):
+        '''Change v's domain, recording the old one'''
+        self.trail.append((v, self.dom[v]))
+        self.dom[v] = mask
+
+    def undo(self, mark):
+        '''Restore the domains changed since mark'''
+        trail = self.trail
+        dom = self.dom
+        while len(trail) > mark:
+            v, mask = trail.pop()
+            dom[v] = mask
+
+class CompiledSearch:
+
+    def __init__(self, compiled, prop='GAC', var_ord='mrv', givens=None):
+        '''prop is 'BT', 'FC' or 'GAC'; var_ord is 'mrv' (smallest
+           domain, ties to the most neighbours) or 'static' (csp.vars
+           order); givens as for SearchState'''
+        self.model = compiled
+        self.prop = prop
+        self.var_ord = var_ord
+        self.state = SearchState(compiled, givens)
+        #the state's lists, bound here for the inner loops
+        self.dom = self.state.dom
+        self.val = self.state.val
+        self.trail = self.state.trail
+        self.stack = []     #frames [var, untried mask, trail mark]
+        self.started = False
+        self.done = False
+        self.nDecisions = 0
+        self.nPrunings = 0
+        self.runtime = 0
+
+    def values(self):
+        '''Codes of the current (complete) assignment'''
+        return list(self.val)
+
+    def set_dom(self, v, mask):
+        '''Internal routine. Change v's domain, recording the old one'''
+        self.trail.append((v, self.dom[v]))
+        self.dom[v] = mask
+
+    def undo(self, mark):
+        '''Internal routine. Restore the domains changed since mark'''
+        self.state.undo(mark)
+
+    def run(self, max_nodes=None, max_time=None):
+        '''Search until a solution is found (True), the search space is
+           exhausted (False), or max_nodes more decisions were made or
+           max_time seconds passed (None, call run again to continue; at
+           least one decision is made per call)'''
+        stime = time.process_time()
+        try:
+            return self.search(max_nodes, max_time)
+        finally:
+            self.runtime += time.process_time() - stime
+
+    def search(self, max_nodes, max_time=None):
+        '''Internal routine. The body of run'''
+        if self.done:
+            return False
+        if not self.started:
+            self.started = True
+            if any(m == 0 for m in self.dom) or not self.propagate(None):
+                self.done = True
+                return False
+            if not self.push_var():
+                return True
+        limit = None if max_nodes is None else self.nDecisions + max_nodes
+        first = self.nDecisions
+        deadline = None if max_time is None else time.perf_counter() + max_time
+        stack = self.stack
+        while stack:
+            frame = stack[-1]
+            var, untried, mark = frame
+            self.undo(mark)
+            if not untried:
+                stack.pop()
+                self.val[var] = -1
+                continue
+            if limit is not None and self.nDecisions >= limit:
+                return None
+            if deadline is not None and self.nDecisions > first and time.perf_counter() >= deadline:
+                return None
+            bit = untried & -untried
+            frame[1] = untried ^ bit
+            self.nDecisions += 1
+            self.set_dom(var, bit)
+            self.val[var] = bit.bit_length() - 1
+            if self.propagate(var) and not self.push_var():
+                return True
+        self.done = True
+        return False
+
+    def push_var(self):
+        '''Internal routine. Choose the next variable and push its frame.
+           Returns False if every variable is assigned.'''
+        dom = self.dom
+        val = self.val
+        best = -1
+        if self.var_ord == 'static':
+            for v in range(len(val)):
+                if val[v] < 0:
+                    best = v
+                    break
+        else:
+            best_key = None
+            neighbours = self.model.neighbours
+            for v in range(len(val)):
+                if val[v] < 0:
+                    key = (bin(dom[v]).count("1"), -len(neighbours[v]))
+                    if best_key is None or key < best_key:
+                        best = v
+                        best_key = key
+        if best < 0:
+            return False
+        self.stack.append([best, dom[best], len(self.trail)])
+        return True
+
+    def propagate(self, var):
+        '''Internal routine. Propagate the assignment of var (None at the
+           root). Returns False on a deadend.'''
+        if self.prop == 'GAC':
+            return self.propagate_gac(var)
+        elif self.prop == 'FC':
+            return self.propagate_fc(var)
+        return self.propagate_bt(var)
+
+    def propagate_bt(self, var):
+        '''Internal routine. Check the constraints of var that are fully
+           assigned'''
+        model = self.model
+        val = self.val
+        cons = range(len(model.scopes)) if var is None else [k for k, i in model.var_cons[var]]
+        for k in cons:
+            t = tuple(val[v] for v in model.scopes[k])
+            if min(t) >= 0 and not model.holds(k, t):
+                return False
+        return True
+
+    def propagate_fc(self, var):
+        '''Internal routine. Forward check the constraints of var with one
+           unassigned variable left'''
+        model = self.model
+        dom = self.dom
+        val = self.val
+        cons = range(len(model.scopes)) if var is None else [k for k, i in model.var_cons[var]]
+        for k in cons:
+            scope = model.scopes[k]
+            free = [i for i, v in enumerate(scope) if val[v] < 0]
+            if len(free) != 1:
+                if not free and not model.holds(k, tuple(val[v] for v in scope)):
+                    return False
+                continue
+            i = free[0]
+            u = scope[i]
+            bin_sup = model.bin_sup[k]
+            if bin_sup is not None:
+                keep = dom[u] & bin_sup[1 - i][val[scope[1 - i]]]
+            else:
+                keep = 0
+                t = [val[v] for v in scope]
+                m = dom[u]
+                sat = model.sat[k]
+                while m:
+                    bit = m & -m
+                    m ^= bit
+                    t[i] = bit.bit_length() - 1
+                    if tuple(t) in sat:
+                        keep |= bit
+            if keep != dom[u]:
+                self.nPrunings += bin(dom[u] ^ keep).count("1")
+                self.set_dom(u, keep)
+                if not keep:
+                    return False
+        return True
+
+    def propagate_gac(self, var):
+        '''Internal routine. Enforce GAC starting from the constraints of
+           var (all constraints at the root)'''
+        model = self.model
+        dom = self.dom
+        if var is None:
+            queue = list(range(len(model.scopes)))
+        else:
+            queue = [k for k, i in model.var_cons[var]]
+        queued = set(queue)
+        while queue:
+            k = queue.pop()
+            queued.discard(k)
+            scope = model.scopes[k]
+            bin_sup = model.bin_sup[k]
+            for i, u in enumerate(scope):
+                m = dom[u]
+                keep = 0
+                if bin_sup is not None:
+                    other = dom[scope[1 - i]]
+                    sup = bin_sup[i]
+                    while m:
+                        bit = m & -m
+                        m ^= bit
+                        if sup[bit.bit_length() - 1] & other:
+                            keep |= bit
+                else:
+                    sups = model.supports[k][i]
+                    while m:
+                        bit = m & -m
+                        m ^= bit
+                        for t in sups[bit.bit_length() - 1]:
+                            for j, w in enumerate(scope):
+                                if not dom[w] >> t[j] & 1:
+                                    break
+                            else:
+                                keep |= bit
+                                break
+                if keep != dom[u]:
+                    self.nPrunings += bin(dom[u] ^ keep).count("1")
+                    self.set_dom(u, keep)
+                    if not keep:
+                        return False
+                    for k2, j in model.var_cons[u]:
+                        if k2 != k and not k2 in queued:
+                            queued.add(k2)
+                            queue.append(k2)
+        return True
+
+def compiled_solve(csp, prop='GAC', var_ord='mrv'):
+    '''Solve csp with the compiled engine. Returns True and assigns the
+       csp's Variables if it has a solution, False otherwise.'''
+    compiled = compile_csp(csp)
+    search = CompiledSearch(compiled, prop, var_ord)
+    if not search.run():
+        return False
+    for var, value in zip(compiled.vars, compiled.decode(search.values())):
+        if var.is_assigned():
+            var.unassign()
+        var.restore_curdom()
+        var.assign(value)
+    return True
+
+def solve_model(compiled, givens=None, prop='GAC', var_ord='mrv', max_nodes=None):
+    '''Solve a compiled model under givens (a dict variable -> value).
+       Returns a dict variable name -> value, or None if there is no
+       solution (or none was found within max_nodes decisions). Only a
+       private SearchState is changed, so concurrent calls may share
+       compiled.'''
+    search = CompiledSearch(compiled, prop, var_ord, givens)
+    if not search.run(max_nodes):
+        return None
+    return dict(zip(compiled.names, compiled.decode(search.values())))
@@ -70,17 +70,18 @@ simpleCSP = CSP("SimpleEqs", [x,y,z,w])
 simpleCSP.add_constraint(c1)
 simpleCSP.add_constraint(c2)
 
-btracker = BT(simpleCSP)
-# btracker.trace_on()
+if __name__ == "__main__":
+    btracker = BT(simpleCSP)
+    # btracker.trace_on()
 
-print("Plain Bactracking on simple CSP")
-btracker.bt_search(prop_BT)
-print("=======================================================")
-# print("Forward Checking on simple CSP")
-# btracker.bt_search(prop_FC)
-# print("=======================================================")
-# print("GAC on simple CSP")
-# btracker.bt_search(prop_GAC)
+    print("Plain Bactracking on simple CSP")
+    btracker.bt_search(prop_BT)
+    print("=======================================================")
+    # print("Forward Checking on simple CSP")
+    # btracker.bt_search(prop_FC)
+    # print("=======================================================")
+    # print("GAC on simple CSP")
+    # btracker.bt_search(prop_GAC)
 
 
 # ======================
@@ -215,14 +216,15 @@ def solve_graph_color(propType, trace=False):
 # ===============
 # Execution block
 # ===============
-trace = False
-print("Plain Backtracking on Colouring Australia")
-solve_graph_color('BT', trace)
-print("=========================================")
-# trace = False
-# print("Forward Checking on Colouring Australia")
-# solve_graph_color('FC', trace)
-# print("=========================================")
+if __name__ == "__main__":
+    trace = False
+    print("Plain Backtracking on Colouring Australia")
+    solve_graph_color('BT', trace)
+    print("=========================================")
+    # trace = False
+    # print("Forward Checking on Colouring Australia")
+    # solve_graph_color('FC', trace)
+    # print("=========================================")
 
 
 # ================
@@ -279,14 +281,15 @@ def solve_nQueens(n, propType, trace=False):
     elif propType == 'GAC':
         solver.bt_search(prop_GAC)
 
-trace = False
-#trace = False
-print("Plain Bactracking on 8-queens")
-solve_nQueens(16, 'BT', trace)
-print("=======================================================")
-#print("Forward Checking 8-queens")
-#solve_nQueens(8, 'FC', trace)
-#print("=======================================================")
-#print("GAC 8-queens")
-#solve_nQueens(8, 'GAC', trace)
+if __name__ == "__main__":
+    trace = False
+    #trace = False
+    print("Plain Bactracking on 8-queens")
+    solve_nQueens(16, 'BT', trace)
+    print("=======================================================")
+    #print("Forward Checking 8-queens")
+    #solve_nQueens(8, 'FC', trace)
+    #print("=======================================================")
+    #print("GAC 8-queens")
+    #solve_nQueens(8, 'GAC', trace)
 
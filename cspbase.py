@@ -5,10 +5,16 @@
 #           - Variables
 #           - Constraints
 #           - CSP
+#           - SearchMonitor
 #           - BT
 #
 
+import json
+import sys
 import time
+from array import array
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 
 '''Constraint Satisfaction Routines
    A) class Variable
@@ -90,14 +96,38 @@ class Variable:
         '''
         self.name = name                #text name for variable
         self.dom = list(domain)         #Make a copy of passed domain
+        #dense value codes: value dom[a] has code a. Current domain
+        #flags, assignments and constraint tables all refer to values
+        #by code; values are only decoded at the interface.
+        self.codes = dict()
+        for a, val in enumerate(self.dom):
+            self.codes.setdefault(val, a)
         self.curdom = [True] * len(domain)      #using list
         #for bt_search
         self.assignedValue = None
+        self.assignedCode = -1
+        #constraints over this variable (filled in by CSP.add_constraint), the
+        #variable's dynamic degree (number of those constraints that
+        #still have another unassigned variable) and its weighted degree
+        #(summed weights of the same constraints). All are kept up to
+        #date incrementally for the degree and dom/wdeg heuristics.
+        self.cons = []
+        self.ddeg = 0
+        self.wdeg = 0
+        #constraints that keep cached support counts over this variable
+        #(see Constraint.init_sup_counts). They are told about every
+        #change to the variable's current domain.
+        self.counters = []
+        #the CSP holding a snapshot of this variable (see CSP.snapshot),
+        #None otherwise. It is told before every change of state.
+        self.recorder = None
+        self.saved = 0
 
     def add_domain_values(self, values):
         '''Add additional domain values to the domain
            Removals not supported removals'''
         for val in values: 
+            self.codes.setdefault(val, len(self.dom))
             self.dom.append(val)
             self.curdom.append(True)
 
@@ -115,11 +145,23 @@ class Variable:
 
     def prune_value(self, value):
         '''Remove value from CURRENT domain'''
-        self.curdom[self.value_index(value)] = False
+        i = self.codes[value]
+        if self.recorder is not None:
+            self.recorder.record(self)
+        if self.counters and self.curdom[i] and not self.is_assigned():
+            for c in self.counters:
+                c.code_removed(self, i)
+        self.curdom[i] = False
 
     def unprune_value(self, value):
         '''Restore value to CURRENT domain'''
-        self.curdom[self.value_index(value)] = True
+        i = self.codes[value]
+        if self.recorder is not None:
+            self.recorder.record(self)
+        if self.counters and not self.curdom[i] and not self.is_assigned():
+            for c in self.counters:
+                c.code_restored(self, i)
+        self.curdom[i] = True
 
     def cur_domain(self):
         '''return list of values in CURRENT domain (if assigned 
@@ -137,12 +179,16 @@ class Variable:
         '''check if value is in CURRENT domain (without constructing list)
            if assigned only assigned value is viewed as being in current 
            domain'''
-        if not value in self.dom:
+        i = self.codes.get(value)
+        if i is None:
             return False
-        if self.is_assigned():
-            return value == self.get_assigned_value()
-        else:
-            return self.curdom[self.value_index(value)]
+        return self.in_cur_domain_code(i)
+
+    def in_cur_domain_code(self, i):
+        '''in_cur_domain for the value with code i'''
+        if self.assignedValue is None:
+            return self.curdom[i]
+        return i == self.assignedCode
 
     def cur_domain_size(self):
         '''Return the size of the variables domain (without construcing list)'''
@@ -153,8 +199,14 @@ class Variable:
 
     def restore_curdom(self):
         '''return all values back into CURRENT domain'''
-        for i in range(len(self.curdom)):
-            self.curdom[i] = True
+        if self.recorder is not None:
+            self.recorder.record(self)
+        for i, flag in enumerate(self.curdom):
+            if not flag:
+                if self.counters and not self.is_assigned():
+                    for c in self.counters:
+                        c.code_restored(self, i)
+                self.curdom[i] = True
 
     #
     #methods for assigning and unassigning
@@ -173,14 +225,43 @@ class Variable:
                   "that is already assigned or illegal value (not in curdom)")
             return
 
+        if self.recorder is not None:
+            self.recorder.record(self)
+        code = self.codes[value]
+        if self.counters:
+            for i, flag in enumerate(self.curdom):
+                if flag and i != code:
+                    for c in self.counters:
+                        c.code_removed(self, i)
+
         self.assignedValue = value
+        self.assignedCode = code
+        for c in self.cons:
+            c.var_assigned(self)
 
     def unassign(self):
         '''Used by bt_search. Unassign and restore old curdom'''
         if not self.is_assigned():
             print("ERROR: trying to unassign variable", self, " not yet assigned")
             return
+        if self.recorder is not None:
+            self.recorder.record(self)
+        if self.counters:
+            for i, flag in enumerate(self.curdom):
+                if flag and i != self.assignedCode:
+                    for c in self.counters:
+                        c.code_restored(self, i)
+
         self.assignedValue = None
+        self.assignedCode = -1
+        #degrees are not tracked while assigned, so recompute them
+        self.ddeg = 0
+        self.wdeg = 0
+        for c in self.cons:
+            c.var_unassigned(self)
+            if c.n_unasgn >= 2:
+                self.ddeg += 1
+                self.wdeg += c.weight
 
     def get_assigned_value(self):
         '''return assigned value...returns None if is unassigned'''
@@ -192,8 +273,8 @@ class Variable:
 
     def value_index(self, value):
         '''Domain values need not be numbers, so return the index
-           in the domain list of a variable value'''
-        return self.dom.index(value)
+           in the domain list of a variable value (its code)'''
+        return self.codes[value]
 
     def __repr__(self):
         return("Var-{}".format(self.name))
@@ -230,27 +311,219 @@ class Constraint:
 
         self.scope = list(scope)
         self.name = name
-        self.sat_tuples = dict()
 
-        #The next object data item 'sup_tuples' will be used to help
-        #support GAC propgation. It allows access to a list of 
-        #satisfying tuples that contain a particular variable/value
-        #pair.
-        self.sup_tuples = dict()
+        #Satisfying tuples are stored encoded, as value codes (see
+        #Variable.codes), column by column: tuple (row) k has code
+        #columns[i][k] at scope position i. Rows are identified by a
+        #mixed radix key of their codes (radix[i] codes at position i),
+        #kept in a bitset over all possible tuples when that is small
+        #('bits') and in the set 'keys' otherwise. 'supports' helps GAC
+        #propagation: supports[i][a] is an array of the rows with code a
+        #at position i. It is only built when first needed (see
+        #build_supports); forward checking, where all other variables
+        #are assigned, looks the one candidate row up by key instead.
+        #residues[i][a] is the row that last supported code a at
+        #position i (-1 if none yet); it is tried first next time.
+        #sat_tuples and sup_tuples give read-only views by value.
+        self.position = dict((var, i) for i, var in enumerate(self.scope))
+        self.radix = [max(1, len(var.dom)) for var in self.scope]
+        self.columns = [array(code_typecode(r)) for r in self.radix]
+        self.n_tuples = 0
+        self.keys = set()
+        self.bits = None
+        self.supports = None
+        self.residues = None
+
+        #Cached support counts used by value ordering heuristics. They
+        #stay None until init_sup_counts is called; from then on
+        #sup_count[i][a] is the number of satisfying tuples with code a
+        #at position i whose values are all still in the current
+        #domains, and n_invalid[k] is the number of values of row k
+        #that are not. Both are updated as domains change.
+        self.sup_count = None
+        self.n_invalid = None
+
+        #Conflict weight for dom/wdeg. Propagators increment it (see
+        #inc_weight) each time this constraint causes a deadend.
+        #n_unasgn counts the unassigned variables of the scope and is
+        #updated by Variable.assign/unassign once the constraint is
+        #attached to its variables, which CSP.add_constraint does.
+        self.weight = 1
+        self.n_unasgn = 0
+        self.attached = False
+
+    def attach(self):
+        '''Internal routine. Link the constraint to its scope variables
+           (done by CSP.add_constraint) so they keep its degree
+           bookkeeping'''
+        if self.attached:
+            return
+        self.attached = True
+        self.n_unasgn = 0
+        for var in self.scope:
+            var.cons.append(self)
+            if not var.is_assigned():
+                self.n_unasgn += 1
+        if self.n_unasgn >= 2:
+            for var in self.scope:
+                if not var.is_assigned():
+                    var.ddeg += 1
+                    var.wdeg += self.weight
+
+    def detach(self):
+        '''Internal routine. Reverse of attach, used when the constraint
+           is retracted from a CSP. Cached support counts are dropped.'''
+        if not self.attached:
+            return
+        self.attached = False
+        if self.n_unasgn >= 2:
+            for var in self.scope:
+                if not var.is_assigned():
+                    var.ddeg -= 1
+                    var.wdeg -= self.weight
+        for var in self.scope:
+            var.cons.remove(self)
+            if self in var.counters:
+                var.counters.remove(self)
+        self.sup_count = None
+        self.n_invalid = None
 
     def add_satisfying_tuples(self, tuples):
-        '''We specify the constraint by adding its complete list of satisfying tuples.'''
-        for x in tuples:
-            t = tuple(x)  #ensure we have an immutable tuple
-            if not t in self.sat_tuples:
-                self.sat_tuples[t] = True
-
-            #now put t in as a support for all of the variable values in it
-            for i, val in enumerate(t):
-                var = self.scope[i]
-                if not (var,val) in self.sup_tuples:
-                    self.sup_tuples[(var,val)] = []
-                self.sup_tuples[(var,val)].append(t)
+        '''We specify the constraint by adding its complete list of satisfying tuples.
+           A tuple with a value outside its variable's domain can never
+           be satisfied and is dropped.'''
+        rows = dict.fromkeys(map(tuple, tuples))    #repeats are encoded once
+        columns = []
+        for var, col in zip(self.scope, zip(*rows)):
+            get = var.codes.get
+            columns.append([get(val, -1) for val in col])
+        if any(-1 in col for col in columns):
+            keep = [k for k in range(len(rows)) if all(col[k] >= 0 for col in columns)]
+            columns = [[col[k] for k in keep] for col in columns]
+            rows = keep
+        self.add_code_columns(columns, len(rows))
+
+    def add_satisfying_codes(self, tuples):
+        '''add_satisfying_tuples for tuples of value codes'''
+        rows = dict.fromkeys(map(tuple, tuples))
+        self.add_code_columns([list(col) for col in zip(*rows)], len(rows))
+
+    def add_code_columns(self, columns, n=None):
+        '''add_satisfying_codes for n tuples given column by column:
+           columns[i] holds the codes at scope position i'''
+        if n is None:
+            n = len(columns[0]) if columns else 0
+        if n == 0:
+            return
+        for i, col in enumerate(columns):
+            top = max(col)
+            if top >= self.radix[i]:    #domain grew after construction
+                self.grow(i, top + 1)
+        keys = self.encode(columns, n)
+
+        total = 1
+        for r in self.radix:
+            total *= r
+        if self.bits is None and total <= 64 * (self.n_tuples + n):
+            #a bit per possible tuple is cheaper than a key per tuple
+            self.bits = bytearray((total + 7) >> 3)
+            for key in self.keys:
+                self.bits[key >> 3] |= 1 << (key & 7)
+            self.keys = None
+
+        new = []
+        bits = self.bits
+        if bits is not None:
+            for k, key in enumerate(keys):
+                byte = key >> 3
+                bit = 1 << (key & 7)
+                if not bits[byte] & bit:
+                    bits[byte] |= bit
+                    new.append(k)
+        else:
+            known = self.keys
+            for k, key in enumerate(keys):
+                if not key in known:
+                    known.add(key)
+                    new.append(k)
+        if len(new) < n:
+            columns = [[col[k] for k in new] for col in columns]
+
+        first = self.n_tuples
+        self.n_tuples += len(new)
+        for i, col in enumerate(columns):
+            self.columns[i].extend(col)
+            if self.supports is not None:
+                #now put the new rows in as supports for all of their values
+                sup = self.supports[i]
+                for k, a in enumerate(col, first):
+                    sup[a].append(k)
+
+        if self.sup_count is not None:
+            self.n_invalid.extend([0] * len(new))
+            for k in range(first, self.n_tuples):
+                self.count_row(k)
+
+    def encode(self, columns, n):
+        '''Internal routine. The keys of n rows given column by column'''
+        keys = [0] * n
+        for r, col in zip(self.radix, columns):
+            keys = [key * r + a for key, a in zip(keys, col)]
+        return keys
+
+    def grow(self, i, size):
+        '''Internal routine. Make room for codes below size at scope
+           position i, whose variable's domain grew, and re-key the rows'''
+        self.radix[i] = max(size, len(self.scope[i].dom))
+        typecode = code_typecode(self.radix[i])
+        if typecode != self.columns[i].typecode:
+            self.columns[i] = array(typecode, self.columns[i])
+        if self.supports is not None:
+            sup = self.supports[i]
+            while len(sup) < self.radix[i]:
+                sup.append(array('I'))
+                self.residues[i].append(-1)
+                if self.sup_count is not None:
+                    self.sup_count[i].append(0)
+        self.keys = set(self.encode(self.columns, self.n_tuples))
+        self.bits = None
+
+    def build_supports(self):
+        '''Internal routine. Index the rows by value (see supports)'''
+        self.supports = []
+        for r, col in zip(self.radix, self.columns):
+            sup = [array('I') for a in range(r)]
+            for k, a in enumerate(col):
+                sup[a].append(k)
+            self.supports.append(sup)
+        self.residues = [array('i', [-1]) * r for r in self.radix]
+
+    def has_key(self, key):
+        '''Internal routine. Is the row with this key in the table'''
+        if self.bits is not None:
+            return bool(self.bits[key >> 3] & (1 << (key & 7)))
+        return key in self.keys
+
+    def code_tuples(self):
+        '''Iterate over the satisfying tuples as tuples of value codes'''
+        if not self.scope:
+            return iter([()] * self.n_tuples)
+        return zip(*self.columns)
+
+    def get_row(self, k):
+        '''The satisfying tuple in row k, as values'''
+        return tuple([var.dom[col[k]] for var, col in zip(self.scope, self.columns)])
+
+    @property
+    def sat_tuples(self):
+        '''Read-only mapping of the satisfying tuples (as values) to True'''
+        return SatTuplesView(self)
+
+    @property
+    def sup_tuples(self):
+        '''Read-only mapping of (variable, value) to the satisfying tuples
+           (as values) containing it'''
+        return SupTuplesView(self)
 
     def get_scope(self):
         '''get list of variables the constraint is over'''
@@ -263,15 +536,19 @@ class Constraint:
            constraints "satisfies" function.  Note the list of values
            are must be ordered in the same order as the list of
            variables in the constraints scope'''
-        return tuple(vals) in self.sat_tuples
+        key = 0
+        for var, r, val in zip(self.scope, self.radix, vals):
+            a = var.codes.get(val)
+            if a is None or a >= r:
+                return False
+            key = key * r + a
+        return self.has_key(key)
 
     def get_n_unasgn(self):
         '''return the number of unassigned variables in the constraint's scope'''
-        n = 0
-        for v in self.scope:
-            if not v.is_assigned():
-                n = n + 1
-        return n
+        if not self.attached:
+            return sum(1 for v in self.scope if not v.is_assigned())
+        return self.n_unasgn
 
     def get_unasgn_vars(self): 
         '''return list of unassigned variables in constraint's scope. Note
@@ -287,23 +564,209 @@ class Constraint:
            of assignments satisfying the constraint where each value is
            still in the corresponding variables current domain
         '''
-        if (var, val) in self.sup_tuples:
-            for t in self.sup_tuples[(var, val)]:
-                if self.tuple_is_valid(t):
-                    return True
+        i = self.position.get(var)
+        a = var.codes.get(val)
+        if i is None or a is None or a >= self.radix[i]:
+            return False
+        if not var.in_cur_domain_code(a):
+            return False
+        others = self.get_n_unasgn() - (var.assignedValue is None)
+        if others == 0:
+            #every other variable is assigned: one candidate row
+            key = 0
+            for v, r in zip(self.scope, self.radix):
+                key = key * r + (a if v is var else v.assignedCode)
+            return self.has_key(key)
+        if self.supports is None:
+            self.build_supports()
+        residues = self.residues[i]
+        if residues[a] >= 0 and self.row_is_valid(residues[a]):
+            return True
+        for k in self.supports[i][a]:
+            if self.row_is_valid(k):
+                residues[a] = k
+                return True
         return False
 
+    def init_sup_counts(self):
+        '''Start caching support counts for this constraint. The counts
+           are computed once from the current domains and afterwards
+           kept up to date incrementally by the scope variables.'''
+        if self.sup_count is not None:
+            return
+        if self.supports is None:
+            self.build_supports()
+        self.sup_count = [[0] * len(sup) for sup in self.supports]
+        self.n_invalid = array('B' if len(self.scope) < 0x100 else 'I', [0]) * self.n_tuples
+        for k in range(self.n_tuples):
+            self.count_row(k)
+        for var in self.scope:
+            var.counters.append(self)
+
+    def count_row(self, k):
+        '''Internal routine. Add row k to the cached support counts'''
+        bad = 0
+        for var, col in zip(self.scope, self.columns):
+            if not var.in_cur_domain_code(col[k]):
+                bad += 1
+        self.n_invalid[k] = bad
+        if bad == 0:
+            for counts, col in zip(self.sup_count, self.columns):
+                counts[col[k]] += 1
+
+    def get_sup_count(self, var, val):
+        '''return the number of currently valid tuples supporting var=val
+           (init_sup_counts must have been called)'''
+        i = self.position.get(var)
+        a = var.codes.get(val)
+        if i is None or a is None or a >= len(self.sup_count[i]):
+            return 0
+        return self.sup_count[i][a]
+
+    def code_removed(self, var, a):
+        '''Internal routine called when the value with code a leaves
+           var's current domain'''
+        sup = self.supports[self.position[var]]
+        if a < len(sup):
+            n_invalid = self.n_invalid
+            for k in sup[a]:
+                n_invalid[k] += 1
+                if n_invalid[k] == 1:
+                    for counts, col in zip(self.sup_count, self.columns):
+                        counts[col[k]] -= 1
+
+    def code_restored(self, var, a):
+        '''Internal routine called when the value with code a returns
+           to var's current domain'''
+        sup = self.supports[self.position[var]]
+        if a < len(sup):
+            n_invalid = self.n_invalid
+            for k in sup[a]:
+                n_invalid[k] -= 1
+                if n_invalid[k] == 0:
+                    for counts, col in zip(self.sup_count, self.columns):
+                        counts[col[k]] += 1
+
+    def inc_weight(self):
+        '''Record that this constraint caused a deadend (domain wipeout or
+           a failed check). Increments the constraint weight and the
+           weighted degree of the scope variables it counts towards.'''
+        self.weight += 1
+        if self.n_unasgn >= 2:
+            for v in self.scope:
+                if not v.is_assigned():
+                    v.wdeg += 1
+
+    def var_assigned(self, var):
+        '''Internal routine called by Variable.assign. Once only one
+           variable of the scope is left unassigned this constraint no
+           longer counts towards that variable's degrees'''
+        self.n_unasgn -= 1
+        if self.n_unasgn == 1:
+            for v in self.scope:
+                if not v.is_assigned():
+                    v.ddeg -= 1
+                    v.wdeg -= self.weight
+                    break
+
+    def var_unassigned(self, var):
+        '''Internal routine called by Variable.unassign (reverse of
+           var_assigned). var recomputes its own degrees.'''
+        self.n_unasgn += 1
+        if self.n_unasgn == 2:
+            for v in self.scope:
+                if v is not var and not v.is_assigned():
+                    v.ddeg += 1
+                    v.wdeg += self.weight
+                    break
+
     def tuple_is_valid(self, t):
-        '''Internal routine. Check if every value in tuple is still in
-           corresponding variable domains'''
-        for i, var in enumerate(self.scope):
-            if not var.in_cur_domain(t[i]):
+        '''Internal routine. Check if every value in tuple (of codes) is
+           still in corresponding variable domains'''
+        for var, a in zip(self.scope, t):
+            if var.assignedValue is None:
+                if not var.curdom[a]:
+                    return False
+            elif var.assignedCode != a:
+                return False
+        return True
+
+    def row_is_valid(self, k):
+        '''Internal routine. tuple_is_valid for row k'''
+        for var, col in zip(self.scope, self.columns):
+            if var.assignedValue is None:
+                if not var.curdom[col[k]]:
+                    return False
+            elif var.assignedCode != col[k]:
                 return False
         return True
 
     def __str__(self):
         return("{}({})".format(self.name,[var.name for var in self.scope]))
 
+def code_typecode(size):
+    '''The smallest array typecode holding the codes of a domain of size values'''
+    if size <= 0x100:
+        return 'B'
+    if size <= 0x10000:
+        return 'H'
+    return 'I'
+
+class SatTuplesView(Mapping):
+    '''Read-only view of the satisfying tuples of a constraint, as a
+       mapping of value tuples to True'''
+
+    def __init__(self, con):
+        self.con = con
+
+    def __getitem__(self, vals):
+        if not self.con.check(vals):
+            raise KeyError(vals)
+        return True
+
+    def __contains__(self, vals):
+        return self.con.check(vals)
+
+    def __iter__(self):
+        doms = [var.dom for var in self.con.scope]
+        for t in self.con.code_tuples():
+            yield tuple([dom[a] for dom, a in zip(doms, t)])
+
+    def __len__(self):
+        return self.con.n_tuples
+
+class SupTuplesView(Mapping):
+    '''Read-only view of the supports of a constraint, as a mapping of
+       (variable, value) to the satisfying tuples (as values) containing
+       that value'''
+
+    def __init__(self, con):
+        self.con = con
+
+    def __getitem__(self, key):
+        var, val = key
+        con = self.con
+        i = con.position.get(var)
+        a = var.codes.get(val) if i is not None else None
+        if a is None or a >= con.radix[i]:
+            raise KeyError(key)
+        if con.supports is None:
+            con.build_supports()
+        if not con.supports[i][a]:
+            raise KeyError(key)
+        return tuple(con.get_row(k) for k in con.supports[i][a])
+
+    def __iter__(self):
+        if self.con.supports is None:
+            self.con.build_supports()
+        for var, sup in zip(self.con.scope, self.con.supports):
+            for a, rows in enumerate(sup):
+                if rows:
+                    yield (var, var.dom[a])
+
+    def __len__(self):
+        return sum(1 for key in self)
+
 class CSP:
     '''Class for packing up a set of variables into a CSP problem.
        Contains various utility routines for accessing the problem.
@@ -318,6 +781,14 @@ class CSP:
         self.vars = []
         self.cons = []
         self.vars_to_cons = dict()
+        #saved variable states, the position in them where each active
+        #snapshot begins, and the epoch, renewed whenever the variables
+        #must save their state again (see snapshot)
+        self.changes = []
+        self.marks = []
+        self.epoch = 0
+        #number of constraints retracted so far (see remove_constraint)
+        self.retracted = 0
         for v in vars:
             self.add_var(v)
 
@@ -331,6 +802,8 @@ class CSP:
         else:
             self.vars.append(v)
             self.vars_to_cons[v] = []
+            if self.marks:
+                v.recorder = self
 
     def add_constraint(self,c):
         '''Add constraint to CSP. Note that all variables in the 
@@ -344,10 +817,22 @@ class CSP:
                     return
                 self.vars_to_cons[v].append(c)
             self.cons.append(c)
+            c.attach()
+
+    def remove_constraint(self, c):
+        '''Retract constraint c from the CSP. It can be added back later.'''
+        if not c in self.cons:
+            print("Trying to remove constraint ", c, " not in CSP object")
+            return
+        self.cons.remove(c)
+        for v in c.scope:
+            self.vars_to_cons[v].remove(c)
+        c.detach()
+        self.retracted += 1
 
     def get_all_cons(self):
         '''return list of all constraints in the CSP'''
-        return self.cons
+        return list(self.cons)
         
     def get_cons_with_var(self, var):
         '''return list of constraints that include var in their scope'''
@@ -361,6 +846,119 @@ class CSP:
         '''return list of unassigned variables in the CSP'''
         return [v for v in self.vars if not v.is_assigned()]
 
+    def components(self, unassigned=False):
+        '''Return the connected components of the constraint graph, each
+           a list of variables in the order of self.vars. With
+           unassigned=True only the unassigned variables are grouped, and
+           constraints with fewer than two unassigned variables connect
+           nothing: the components are the parts of the remaining problem
+           that can be solved independently.'''
+        order = dict((v, i) for i, v in enumerate(self.vars))
+        seen = set()
+        comps = []
+        for v in self.vars:
+            if v in seen or (unassigned and v.is_assigned()):
+                continue
+            seen.add(v)
+            comp = [v]
+            for u in comp:
+                for c in self.vars_to_cons[u]:
+                    if unassigned and c.n_unasgn < 2:
+                        continue
+                    for w in c.scope:
+                        if not w in seen and w in order and not (unassigned and w.is_assigned()):
+                            seen.add(w)
+                            comp.append(w)
+            comp.sort(key=order.get)
+            comps.append(comp)
+        return comps
+
+    def sub_csp(self, vars, name=None):
+        '''Return a CSP over vars (some of this CSP's variables) with all
+           the constraints that mention them. Variables and constraints
+           are shared, not copied. A constraint may also mention variables
+           outside vars; that is only meaningful if those are assigned.'''
+        sub = CSP(name or self.name, vars)
+        added = set()
+        for v in vars:
+            for c in self.vars_to_cons[v]:
+                if not c in added:
+                    added.add(c)
+                    sub.cons.append(c)
+                    for w in c.scope:
+                        if w in sub.vars_to_cons:
+                            sub.vars_to_cons[w].append(c)
+        return sub
+
+    def snapshot(self):
+        '''Return a snapshot of the variables' state: their current
+           domains and assignments. Storage is copy on write: while a
+           snapshot is held, a variable saves its state the first time it
+           changes, so taking and restoring a snapshot costs time
+           proportional to the variables changed in between rather than
+           to the size of the CSP, and nothing is saved when no snapshot
+           is held. Snapshots nest. Constraint weights are learned, not
+           state, and are not restored.'''
+        if not self.marks:
+            for v in self.vars:
+                v.recorder = self
+        self.epoch += 1
+        self.marks.append(len(self.changes))
+        return len(self.marks) - 1
+
+    def record(self, var):
+        '''Internal routine called by var before it changes: save its
+           state unless it was saved since the latest snapshot'''
+        if var.saved != self.epoch:
+            var.saved = self.epoch
+            self.changes.append((var, list(var.curdom), var.assignedValue))
+
+    def restore(self, snap):
+        '''Undo the changes made since snapshot snap, which stays valid;
+           snapshots taken after it are discarded. The variables are reset
+           through prune_value, unprune_value, assign and unassign, so
+           degrees, weights and support counts stay consistent.'''
+        del self.marks[snap + 1:]
+        mark = self.marks[snap]
+        log = self.changes
+        while len(log) > mark:
+            var, curdom, value = log.pop()
+            var.recorder = None
+            if var.is_assigned() and var.get_assigned_value() != value:
+                var.unassign()
+            for i, flag in enumerate(curdom):
+                if var.curdom[i] != flag:
+                    if flag:
+                        var.unprune_value(var.dom[i])
+                    else:
+                        var.prune_value(var.dom[i])
+            if value is not None and not var.is_assigned():
+                var.assign(value)
+            var.recorder = self
+        self.epoch += 1
+
+    def release(self, snap):
+        '''Forget snapshot snap and any taken after it, keeping the
+           changes. Once no snapshot is left nothing is saved any more.'''
+        del self.marks[snap:]
+        if not self.marks:
+            del self.changes[:]
+            for v in self.vars:
+                v.recorder = None
+            return
+        #the enclosing snapshot needs each variable's oldest saved state
+        #only
+        self.epoch += 1
+        mark = self.marks[-1]
+        seen = set()
+        kept = []
+        for var, curdom, value in self.changes[mark:]:
+            if not var in seen:
+                seen.add(var)
+                var.saved = self.epoch
+                kept.append((var, curdom, value))
+        self.changes[mark:] = kept
+
     def print_all(self):
         print("CSP", self.name)
         print("   Variables = ", self.vars)
@@ -373,6 +971,134 @@ class CSP:
             print(v, " = ", v.get_assigned_value(), "    ", end='')
         print("")
 
+class SearchMonitor:
+    '''Base class for objects that observe bt_search, e.g. heuristics
+       that learn from the search. Register a monitor with
+       BT.add_monitor and override the hooks of interest:
+
+       decided(csp, var, val, level)
+           called when bt_search assigns var=val at depth level (1 for
+           the first decision), before propagating it.
+
+       propagated(csp, var, val, status, prunings)
+           called after every call of the propagator with the status
+           and prunings it returned. var/val is the assignment that was
+           just propagated, or None/None for the initial propagation
+           made before any assignments.
+
+       backtracked(csp, var, val, level)
+           called when the decision var=val at depth level has been
+           undone.
+
+       solved(csp, values)
+           called for every solution recorded, values in csp.vars order.
+
+       finished(csp, status)
+           called when bt_search is about to return status.
+
+       A monitor keeps its own data, so whatever it learns persists
+       across bt_search calls (restarts) on the same CSP. Decisions and
+       backtracks are only reported when some monitor is registered, so
+       they cost nothing otherwise.'''
+
+    def decided(self, csp, var, val, level):
+        pass
+
+    def propagated(self, csp, var, val, status, prunings):
+        pass
+
+    def backtracked(self, csp, var, val, level):
+        pass
+
+    def solved(self, csp, values):
+        pass
+
+    def finished(self, csp, status):
+        pass
+
+class Tracer(SearchMonitor):
+    '''Writes the search as a stream of JSON lines, one event each:
+
+       {"e": "start", "d": 0, "pruned": [[var, val], ...]}   root propagation
+       {"e": "assign", "d": depth, "var": var, "val": val}
+       {"e": "prune", "d": depth, "pruned": [[var, val], ...]}
+       {"e": "fail", "d": depth, "var": var, "val": val}     propagation deadend
+       {"e": "backtrack", "d": depth, "var": var, "val": val}
+       {"e": "solution", "d": depth, "values": {var: val, ...}}
+       {"e": "end", "d": 0, "status": true | false | null}
+
+       Variables are given by name and values not representable in JSON
+       as strings. depth (an int) drops the events below that depth and
+       vars (variable names) restricts assign, fail, backtrack and prune
+       events to those variables. Lines are buffered and written every
+       buffer_size events and at the end of each search.
+
+           solver.add_monitor(Tracer(open('trace.jsonl', 'w')))
+       or
+           solver.trace_on(out, depth=10)'''
+
+    def __init__(self, out=None, depth=None, vars=None, buffer_size=1000):
+        self.out = out if out is not None else sys.stdout
+        self.depth = depth
+        self.vars = None if vars is None else set(vars)
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.level = 0
+
+    def emit(self, event):
+        '''Internal routine. Buffer one event'''
+        self.buffer.append(json.dumps(event, default=str))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        '''Write out the buffered events'''
+        if self.buffer:
+            self.out.write('\n'.join(self.buffer) + '\n')
+            self.out.flush()
+            self.buffer = []
+
+    def shown(self, var, level):
+        '''Internal routine. True if events of var at level pass the filters'''
+        if self.depth is not None and level > self.depth:
+            return False
+        return self.vars is None or var.name in self.vars
+
+    def decided(self, csp, var, val, level):
+        self.level = level
+        if self.shown(var, level):
+            self.emit({'e': 'assign', 'd': level, 'var': var.name, 'val': val})
+
+    def propagated(self, csp, var, val, status, prunings):
+        if var is None:
+            #root propagation: assumptions that follow are at depth 0
+            self.level = 0
+        level = self.level
+        if self.depth is not None and level > self.depth:
+            return
+        pruned = [[v.name, x] for v, x in prunings if self.vars is None or v.name in self.vars]
+        if var is None:
+            self.emit({'e': 'start', 'd': 0, 'pruned': pruned})
+        elif pruned:
+            self.emit({'e': 'prune', 'd': level, 'pruned': pruned})
+        if not status and var is not None and self.shown(var, level):
+            self.emit({'e': 'fail', 'd': level, 'var': var.name, 'val': val})
+
+    def backtracked(self, csp, var, val, level):
+        self.level = level - 1
+        if self.shown(var, level):
+            self.emit({'e': 'backtrack', 'd': level, 'var': var.name, 'val': val})
+
+    def solved(self, csp, values):
+        if self.depth is None or self.level <= self.depth:
+            self.emit({'e': 'solution', 'd': self.level,
+                       'values': dict((v.name, x) for v, x in zip(csp.vars, values))})
+
+    def finished(self, csp, status):
+        self.level = 0
+        self.emit({'e': 'end', 'd': 0, 'status': status})
+        self.flush()
+
 ########################################################
 # Backtracking Routine                                 #
 ########################################################
@@ -394,18 +1120,136 @@ class BT:
                             #assignments made during search
         self.nPrunings  = 0 #nPrunings is the number of value prunings during search
         unasgn_vars = list() #used to track unassigned variables
-        self.TRACE = False
+        self.TRACE = False  #set by trace_on, which registers self.tracer
+        self.tracer = None
+        self.QUIET = False #when set bt_search prints nothing
         self.runtime = 0
-
-    def trace_on(self):
-        '''Turn search trace on'''
+        self.monitors = [] #SearchMonitor objects observing the search
+
+        #search budget (see set_limits). aborted is set once the budget
+        #is exhausted and makes the search unwind.
+        self.limited = False
+        self.max_decisions = None
+        self.time_limit = None
+        self.deadline = None
+        self.aborted = False
+        self.cancelled = False
+
+        #solutions found by the last bt_search, each a list of values in
+        #the order of csp.vars (see max_solutions of bt_search)
+        self.solutions = []
+        self.max_solutions = 1
+        self.distinct_on = None
+        self.solution_keys = set()
+
+        #dynamic decomposition (see split_on). view is the part of the
+        #CSP the heuristics choose from, pending the number of enclosing
+        #bt_split calls waiting for the current component.
+        self.SPLIT = False
+        self.splitting = False
+        self.pending = 0
+        self.view = csp
+
+        #incremental solving (see incremental_on). root_snap is a
+        #snapshot of the propagated root, root_key what it depends on.
+        self.INCREMENTAL = False
+        self.root_snap = None
+        self.root_key = None
+        self.root_ncons = 0
+        self.root_status = True
+
+    def add_monitor(self, monitor):
+        '''Register a SearchMonitor to be notified during search'''
+        self.monitors.append(monitor)
+
+    def remove_monitor(self, monitor):
+        '''Stop notifying monitor'''
+        self.monitors.remove(monitor)
+
+    def trace_on(self, out=None, depth=None, vars=None):
+        '''Turn search trace on: a Tracer writing JSON lines to out
+           (default stdout), filtered by depth and vars'''
+        self.trace_off()
+        self.tracer = Tracer(out, depth, vars)
+        self.add_monitor(self.tracer)
         self.TRACE = True
 
     def trace_off(self):
         '''Turn search trace off'''
+        if self.TRACE:
+            self.tracer.flush()
+            self.remove_monitor(self.tracer)
+            self.tracer = None
         self.TRACE = False
 
-        
+    def quiet_on(self):
+        '''Stop bt_search from printing results and statistics'''
+        self.QUIET = True
+
+    def quiet_off(self):
+        '''Let bt_search print results and statistics'''
+        self.QUIET = False
+
+    def incremental_on(self):
+        '''Keep the propagated root between bt_search calls. The next
+           call restores it instead of restoring every domain and
+           propagating again; constraints added since are propagated
+           from it, and only a retracted constraint or another
+           propagator forces a fresh start. Together with the
+           assumptions of bt_search this makes re-solving after a few
+           changes cheap. Constraint weights and monitors keep what they
+           learned in any case.'''
+        self.INCREMENTAL = True
+
+    def incremental_off(self):
+        '''Forget the kept root and start every bt_search from scratch'''
+        self.INCREMENTAL = False
+        if self.root_snap is not None:
+            self.csp.release(self.root_snap)
+            self.root_snap = None
+
+    def split_on(self):
+        '''Let bt_search split the unassigned variables into independent
+           components (see CSP.components) whenever an assignment
+           disconnects them, and solve those one after the other. A
+           component without a solution then fails the node at once
+           instead of backtracking through the other components. Only
+           used when a single solution is looked for.'''
+        self.SPLIT = True
+
+    def split_off(self):
+        '''Search the CSP as a whole'''
+        self.SPLIT = False
+
+    def set_limits(self, max_decisions=None, time_limit=None):
+        '''Give each following bt_search a budget: at most max_decisions
+           variable assignments and/or time_limit seconds (wall clock).
+           None means unlimited. A search that runs out of budget
+           returns None.'''
+        self.max_decisions = max_decisions
+        self.time_limit = time_limit
+        self.limited = max_decisions is not None or time_limit is not None or self.cancelled
+
+    def cancel(self):
+        '''Stop the running (or next) bt_search as if its budget had run
+           out, so it returns None. Safe to call from another thread;
+           the search notices before its next decision and unwinds,
+           leaving the CSP as a finished search does. Only that search
+           is stopped: the solver can be used again afterwards.'''
+        self.cancelled = True
+        self.limited = True
+
+    def out_of_budget(self):
+        '''Check the search budget, setting aborted once it is used up'''
+        if not self.aborted:
+            if self.cancelled:
+                self.aborted = True
+            elif self.max_decisions is not None and self.nDecisions >= self.max_decisions:
+                self.aborted = True
+            elif self.deadline is not None and time.perf_counter() > self.deadline:
+                self.aborted = True
+        return self.aborted
+
     def clear_stats(self):
         '''Initialize counters'''
         self.nDecisions = 0
@@ -433,7 +1277,8 @@ class BT:
         '''Add variable back to list of unassigned vars'''
         self.unasgn_vars.append(var)
         
-    def bt_search(self,propagator,var_ord=None,val_ord=None):
+    def bt_search(self,propagator,var_ord=None,val_ord=None,max_solutions=1,distinct_on=None,
+                  assumptions=None):
         '''Try to solve the CSP using specified propagator routine
 
            propagator == a function with the following template
@@ -467,93 +1312,331 @@ class BT:
 
            var_ord is the variable ordering function currently being used; 
            val_ord is the value ordering function currently being used.
+
+           max_solutions is the number of solutions to look for (None for
+           all of them). Every solution found is recorded in
+           self.solutions. distinct_on optionally lists the variables that
+           tell solutions apart: solutions agreeing on them are only
+           recorded and counted once.
+
+           assumptions is an optional list of (Variable, value) pairs
+           assigned (and propagated) after the root propagation and kept
+           for this call only: the search looks for solutions extending
+           them. Failing assumptions make the call return False.
+
+           Returns True if a solution was found (the variables are left
+           assigned to the last one found), False if the CSP has no
+           solution and None if the search budget (see set_limits) ran
+           out first, even if some solutions (kept in self.solutions)
+           were found before it did.
            '''
 
         self.clear_stats()
         stime = time.process_time()
+        self.aborted = False
+        self.solutions = []
+        self.solution_keys = set()
+        self.max_solutions = max_solutions
+        self.distinct_on = distinct_on
+        self.splitting = self.SPLIT and max_solutions == 1
+        self.pending = 0
+        self.view = self.csp
+        if self.time_limit is not None:
+            self.deadline = time.perf_counter() + self.time_limit
+        else:
+            self.deadline = None
+
+        if self.INCREMENTAL:
+            status, prunings = self.incremental_root(propagator)
+        else:
+            self.restore_all_variable_domains()
+            status, prunings = self.root_propagate(propagator)
+
+        assumed = []
+        if status and assumptions:
+            status = self.assume(assumptions, propagator, assumed, prunings)
 
-        self.restore_all_variable_domains()
-        
         self.unasgn_vars = []
         for v in self.csp.vars:
             if not v.is_assigned():
                 self.unasgn_vars.append(v)
 
-        status, prunings = propagator(self.csp) #initial propagate no assigned variables.
-        self.nPrunings = self.nPrunings + len(prunings)
-
-        if self.TRACE:
-            print(len(self.unasgn_vars), " unassigned variables at start of search")
-            print("Root Prunings: ", prunings)
-
         if status == False:
-            print("CSP{} detected contradiction at root".format(
-                self.csp.name))
+            if not self.QUIET:
+                print("CSP{} detected contradiction at root".format(
+                    self.csp.name))
         else:
             status = self.bt_recurse(propagator, var_ord, val_ord, 1)   #now do recursive search
 
-        self.restoreValues(prunings)
-        if status == False:
-            print("CSP{} unsolved. Has no solutions".format(self.csp.name))
-        if status == True:
-            print("CSP {} solved. CPU Time used = {}".format(self.csp.name,
-                                                             time.process_time() - stime))
-            self.csp.print_soln()
+        if self.INCREMENTAL:
+            if status != True:
+                self.csp.restore(self.root_snap)
+        else:
+            self.restoreValues(prunings)
+            if status != True:
+                for var in assumed:
+                    var.unassign()
+        self.runtime = time.process_time() - stime
+        if status == False and self.aborted:
+            #cut off before max_solutions were found: the solutions found
+            #so far are kept in self.solutions, but there may be more
+            status = None
+        elif status == False and self.solutions:
+            #search space exhausted with fewer than max_solutions
+            #solutions: reinstate the last one found
+            for var, val in zip(self.csp.vars, self.solutions[-1]):
+                if var.is_assigned():
+                    var.unassign()
+                var.assign(val)
+            status = True
+        if self.cancelled:
+            #a cancel stops one search; the limits set stay in force
+            self.cancelled = False
+            self.limited = self.max_decisions is not None or self.time_limit is not None
+        for m in self.monitors:
+            m.finished(self.csp, status)
+
+        if not self.QUIET:
+            if status == None:
+                print("CSP {} search stopped: budget exhausted".format(self.csp.name))
+            if status == False:
+                print("CSP{} unsolved. Has no solutions".format(self.csp.name))
+            if status == True:
+                print("CSP {} solved. CPU Time used = {}".format(self.csp.name,
+                                                                 self.runtime))
+                if max_solutions != 1:
+                    print("{} solutions found".format(len(self.solutions)))
+                self.csp.print_soln()
+
+            print("bt_search finished")
+            self.print_stats()
+        return status
+
+    def root_propagate(self, propagator):
+        '''Internal routine. Propagate before any assignments are made'''
+        status, prunings = propagator(self.csp) #initial propagate no assigned variables.
+        self.nPrunings = self.nPrunings + len(prunings)
+        for m in self.monitors:
+            m.propagated(self.csp, None, None, status, prunings)
+        return status, prunings
+
+    def incremental_root(self, propagator):
+        '''Internal routine. Return to the root kept by the last
+           bt_search if it is still valid, propagating the constraints
+           added since, or build and keep a new one'''
+        csp = self.csp
+        key = (propagator, csp.retracted)
+        if self.root_snap is not None and self.root_key == key:
+            csp.restore(self.root_snap)
+            if self.root_status == False or len(csp.cons) == self.root_ncons:
+                return self.root_status, []
+            #new constraints only remove solutions, so the kept root
+            #prunings stay valid
+            csp.release(self.root_snap)
+        else:
+            if self.root_snap is not None:
+                csp.release(self.root_snap)
+            self.restore_all_variable_domains()
+        status, prunings = self.root_propagate(propagator)
+        self.root_key = key
+        self.root_ncons = len(csp.cons)
+        self.root_status = status
+        self.root_snap = csp.snapshot()
+        return status, prunings
+
+    def assume(self, assumptions, propagator, assumed, prunings):
+        '''Internal routine. Assign and propagate the assumptions,
+           collecting the assigned variables in assumed and the
+           prunings in prunings. Returns False on a deadend.'''
+        for var, val in assumptions:
+            if var.is_assigned() and var.get_assigned_value() == val:
+                continue
+            if var.is_assigned() or not var.in_cur_domain(val):
+                return False
+            var.assign(val)
+            assumed.append(var)
+            status, pruned = propagator(self.csp, var)
+            self.nPrunings = self.nPrunings + len(pruned)
+            prunings.extend(pruned)
+            for m in self.monitors:
+                m.propagated(self.csp, var, val, status, pruned)
+            if not status:
+                return False
+        return True
 
-        print("bt_search finished")
-        self.print_stats()
+    def record_solution(self):
+        '''Internal routine. Store the current (complete) assignment and
+           return True if the search should stop'''
+        values = [var.get_assigned_value() for var in self.csp.vars]
+        if self.distinct_on is not None:
+            key = tuple(var.get_assigned_value() for var in self.distinct_on)
+            if key in self.solution_keys:
+                return False
+            self.solution_keys.add(key)
+        self.solutions.append(values)
+        for m in self.monitors:
+            m.solved(self.csp, values)
+        return self.max_solutions is not None and len(self.solutions) >= self.max_solutions
 
     def bt_recurse(self, propagator, var_ord, val_ord, level):
         '''Return true if found solution. False if still need to search.
            If top level returns false--> no solution'''
 
-        if self.TRACE:
-            print('  ' * level, "bt_recurse level ", level)
-           
         if not self.unasgn_vars:
             #all variables assigned
-            return True
+            if self.pending:
+                return True     #component done, back to bt_split
+            return self.record_solution()
         else:
+            if self.splitting:
+                comps = self.view.components(unassigned=True)
+                if len(comps) > 1:
+                    return self.bt_split(comps, propagator, var_ord, val_ord, level)
+
             ##Figure out which variable to assign,
             ##Then remove it from the list of unassigned vars
             if var_ord:
-              var = var_ord(self.csp)
+              var = var_ord(self.view)
             else:
               var = self.unasgn_vars[0]
             self.unasgn_vars.remove(var) 
 
-            if self.TRACE:
-                print('  ' * level, "bt_recurse var = ", var)
-
             if val_ord:
-              value_order = val_ord(self.csp,var)
+              value_order = val_ord(self.view,var)
             else:
               value_order = var.cur_domain()
 
             for val in value_order:
 
-                if self.TRACE:
-                    print('  ' * level, "bt_recurse trying", var, "=", val)
+                if self.limited and self.out_of_budget():
+                    break
 
                 var.assign(val)
                 self.nDecisions = self.nDecisions+1
+                if self.monitors:
+                    for m in self.monitors:
+                        m.decided(self.csp, var, val, level)
 
                 status, prunings = propagator(self.csp, var)
                 self.nPrunings = self.nPrunings + len(prunings)
-
-                if self.TRACE:
-                    print('  ' * level, "bt_recurse prop status = ", status)
-                    print('  ' * level, "bt_recurse prop pruned = ", prunings)
+                for m in self.monitors:
+                    m.propagated(self.csp, var, val, status, prunings)
 
                 if status:
                     if self.bt_recurse(propagator, var_ord,val_ord, level+1):
                         return True
 
-                if self.TRACE:
-                    print('  ' * level, "bt_recurse restoring ", prunings)
                 self.restoreValues(prunings)
                 var.unassign()
+                if self.monitors:
+                    for m in self.monitors:
+                        m.backtracked(self.csp, var, val, level)
 
             self.restoreUnasgnVar(var)
             return False
 
+    def bt_split(self, comps, propagator, var_ord, val_ord, level):
+        '''Internal routine. Solve the independent components comps of
+           the remaining problem one after the other. They share no
+           unassigned variables, so if one has no solution neither has
+           the node, and the components solved before it are undone
+           rather than searched again.'''
+        snap = self.csp.snapshot()
+        outer_view = self.view
+        self.pending += 1
+        solved = True
+        for comp in comps:
+            self.unasgn_vars = list(comp)
+            self.view = outer_view.sub_csp(comp)
+            if not self.bt_recurse(propagator, var_ord, val_ord, level):
+                solved = False
+                break
+        self.pending -= 1
+        self.view = outer_view
+
+        if not solved:
+            self.csp.restore(snap)
+        self.csp.release(snap)
+        if not solved:
+            self.unasgn_vars = [var for comp in comps for var in comp]
+            return False
+        self.unasgn_vars = []
+        if self.pending:
+            return True
+        return self.record_solution()
+
+    def solve_components(self, propagator, var_ord=None, val_ord=None, workers=1):
+        '''Solve every connected component of the CSP (see
+           CSP.components) as a CSP of its own with bt_search, using the
+           limits set with set_limits for each. With workers > 1 the
+           components are solved in that many processes; propagator,
+           var_ord and val_ord must then be module level functions so
+           they can be pickled. Monitors are only notified when solving
+           in this process.
+
+           Returns True if every component was solved (all variables are
+           then assigned), False if some component has no solution and
+           None if a component ran out of budget.'''
+        self.clear_stats()
+        stime = time.process_time()
+        self.restore_all_variable_domains()
+        subs = [self.csp.sub_csp(comp, "{}[{}]".format(self.csp.name, i))
+                for i, comp in enumerate(self.csp.components())]
+
+        parallel = workers > 1 and len(subs) > 1
+        if parallel:
+            chunk = max(1, len(subs) // (4 * workers))
+            args = [(sub, propagator, var_ord, val_ord, self.max_decisions, self.time_limit)
+                    for sub in subs]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(solve_component, *zip(*args), chunksize=chunk))
+        else:
+            results = []
+            for sub in subs:
+                results.append(solve_component(sub, propagator, var_ord, val_ord,
+                                               self.max_decisions, self.time_limit,
+                                               self.monitors))
+                if results[-1][0] != True:
+                    break
+
+        status = True
+        for sub, (sub_status, values, decisions, prunings) in zip(subs, results):
+            self.nDecisions += decisions
+            self.nPrunings += prunings
+            if sub_status == True:
+                if parallel:
+                    for var, val in zip(sub.vars, values):
+                        var.assign(val)
+            elif sub_status == False:
+                status = False
+            elif status:
+                status = None
+        if status != True:
+            for var in self.csp.vars:
+                if var.is_assigned():
+                    var.unassign()
+        self.runtime = time.process_time() - stime
+
+        if not self.QUIET:
+            if status == None:
+                print("CSP {} search stopped: budget exhausted".format(self.csp.name))
+            if status == False:
+                print("CSP{} unsolved. Has no solutions".format(self.csp.name))
+            if status == True:
+                print("CSP {} solved in {} components. CPU Time used = {}".format(
+                    self.csp.name, len(subs), self.runtime))
+                self.csp.print_soln()
+            self.print_stats()
+        return status
+
+def solve_component(csp, propagator, var_ord, val_ord, max_decisions, time_limit, monitors=()):
+    '''Solve csp with a quiet BT (see BT.solve_components); return the
+       status, the values of csp.vars and the search statistics'''
+    solver = BT(csp)
+    solver.quiet_on()
+    solver.set_limits(max_decisions, time_limit)
+    for m in monitors:
+        solver.add_monitor(m)
+    status = solver.bt_search(propagator, var_ord, val_ord)
+    values = [var.get_assigned_value() for var in csp.vars]
+    return status, values, solver.nDecisions, solver.nPrunings
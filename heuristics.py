@@ -25,50 +25,297 @@ var_ordering == a function with the following template
 
     var_ordering returns the next Variable to be assigned, as per the definition
     of the heuristic it implements.
+
+val_ordering == a function with the following template
+    val_ordering(csp, var)
+        ==> returns [Value, Value, ...]
+
+    val_ordering returns the values of var's current domain in the order
+    they should be tried by bt_search.
 '''
 
+from cspbase import *
+import math
+
+def dyn_degree(csp, var):
+    ''' number of csp's constraints over var that still have another
+    unassigned variable. var.ddeg maintains it incrementally over the
+    constraints attached to var (see CSP.add_constraint); if var also
+    belongs to another CSP those differ from csp's and it is counted. '''
+    cons = csp.vars_to_cons[var]
+    if len(cons) == len(var.cons):
+        return var.ddeg
+    return sum(1 for c in cons if c.n_unasgn >= 2)
+
+
+def weighted_degree(csp, var):
+    ''' as dyn_degree, summing the weights of the constraints '''
+    cons = csp.vars_to_cons[var]
+    if len(cons) == len(var.cons):
+        return var.wdeg
+    return sum(c.weight for c in cons if c.n_unasgn >= 2)
+
+
 def ord_dh(csp):
     ''' return variables according to the Degree Heuristic '''
-    
-    variable_name = []
-    temp = []
 
-    for i in csp.get_all_vars():
-        variable_name.append(i) # add all names into the list for later output
-        elem = len(csp.get_cons_with_var(i))
-        temp.append(elem)
-    position = temp.index(max(temp)) #drgree huristic obtain the max num
-    return variable_name[position]
+    # dynamic degree: the unassigned variable involved in the most
+    # constraints that still have another unassigned variable. Degrees
+    # are maintained by Variable.assign/unassign through each variable's
+    # constraint list, so nothing is rebuilt here. Ties go to the
+    # smaller current domain.
+    best = None
+    best_key = None
+    for v in csp.get_all_unasgn_vars():
+        key = (-dyn_degree(csp, v), v.cur_domain_size())
+        if best_key is None or key < best_key:
+            best = v
+            best_key = key
+    return best
 
 
+def ord_mrv(csp):
 
+    ''' return variable according to the Minimum Remaining Values heuristic:
+    the unassigned variable with the smallest current domain, the first
+    one on ties '''
 
-def ord_mrv(csp):
+    best = None
+    for v in csp.get_all_unasgn_vars():
+        if best is None or v.cur_domain_size() < best.cur_domain_size():
+            best = v
+    return best
+
+
+def ord_dom_wdeg(csp):
+
+    ''' return variable according to the dom/wdeg heuristic: the unassigned
+    variable with the smallest ratio of current domain size to weighted
+    degree. Constraint weights are bumped by the propagators on every
+    deadend and each variable's weighted degree (counting only constraints
+    with another unassigned variable) is maintained incrementally, so no
+    constraint has to be visited here. Ties go to the smaller domain. '''
+
+    best = None
+    best_key = None
+    for v in csp.get_all_unasgn_vars():
+        size = v.cur_domain_size()
+        wdeg = weighted_degree(csp, v)
+        if wdeg > 0:
+            key = (size / wdeg, size)
+        else:
+            key = (float('inf'), size)
+        if best_key is None or key < best_key:
+            best = v
+            best_key = key
+    return best
+
+
+def ord_dom_ddeg(csp):
+
+    ''' return variable according to the dom/ddeg heuristic: the unassigned
+    variable with the smallest ratio of current domain size to dynamic
+    degree. Ties go to the larger dynamic degree. '''
+
+    best = None
+    best_key = None
+    for v in csp.get_all_unasgn_vars():
+        size = v.cur_domain_size()
+        ddeg = dyn_degree(csp, v)
+        if ddeg > 0:
+            key = (size / ddeg, -ddeg)
+        else:
+            key = (float('inf'), size)
+        if best_key is None or key < best_key:
+            best = v
+            best_key = key
+    return best
+
+
+def val_lcv(csp, var):
+
+    ''' return var's current domain ordered by the Least Constraining Value
+    heuristic: values that leave the most support for the other unassigned
+    variables come first. For binary constraints the number of supporting
+    tuples of var=val is exactly the neighbour's domain size minus the
+    values val would eliminate, so ranking by support counts ranks by
+    eliminated values. Counts are cached per constraint and maintained as
+    domains change (see Constraint.init_sup_counts). '''
+
+    cons = []
+    for c in csp.vars_to_cons[var]:
+        if c.get_n_unasgn() > 1:
+            if c.sup_count is None:
+                c.init_sup_counts()
+            cons.append(c)
+
+    values = var.cur_domain()
+    if not cons:
+        return values
+    supports = dict()
+    for val in values:
+        supports[val] = sum(c.get_sup_count(var, val) for c in cons)
+    return sorted(values, key=lambda val: -supports[val])
+
+
+class ImpactHeuristic(SearchMonitor):
+
+    ''' Impact-based search. The impact of an assignment var=val is the
+    fraction of the search space (product of current domain sizes) that
+    its propagation removed; 1 if it led to a deadend. Impacts are measured
+    from the prunings reported after every propagation and averaged per
+    (var, val). Register the object with BT.add_monitor and pass its
+    var_ord/val_ord methods to bt_search:
+
+        ibs = ImpactHeuristic()
+        solver.add_monitor(ibs)
+        solver.bt_search(prop_GAC, ibs.var_ord, ibs.val_ord)
+
+    Statistics live on the object, so they carry over between searches. '''
+
+    def __init__(self):
+        self.impact = dict()    # (var, val) -> [average impact, samples]
+
+    def propagated(self, csp, var, val, status, prunings):
+        if var is None:
+            return
+        if not status:
+            impact = 1.0
+        else:
+            removed = dict()
+            for v, _ in prunings:
+                removed[v] = removed.get(v, 0) + 1
+            # var went from its unpruned values down to the single value val
+            before = sum(1 for flag in var.curdom if flag) + removed.pop(var, 0)
+            log_ratio = math.log(before)
+            for v, n in removed.items():
+                if not v.is_assigned():
+                    size = v.cur_domain_size()
+                    log_ratio += math.log((size + n) / size)
+            impact = 1.0 - math.exp(-log_ratio)
+        avg = self.impact.get((var, val))
+        if avg is None:
+            self.impact[(var, val)] = [impact, 1]
+        else:
+            avg[1] += 1
+            avg[0] += (impact - avg[0]) / avg[1]
+
+    def get_impact(self, var, val):
+        ''' average impact of var=val, 0 if never tried '''
+        avg = self.impact.get((var, val))
+        return avg[0] if avg else 0.0
+
+    def var_ord(self, csp):
+        ''' the unassigned variable whose branches leave the least search
+        space, i.e. minimizing the sum of (1 - impact) over its current
+        domain (plain MRV before anything has been learned) '''
+        best = None
+        best_key = None
+        for v in csp.get_all_unasgn_vars():
+            key = sum(1.0 - self.get_impact(v, val) for val in v.cur_domain())
+            if best_key is None or key < best_key:
+                best = v
+                best_key = key
+        return best
+
+    def val_ord(self, csp, var):
+        ''' values with the smallest impact first '''
+        return sorted(var.cur_domain(), key=lambda val: self.get_impact(var, val))
+
+
+class ActivityHeuristic(SearchMonitor):
+
+    ''' Activity-based search. Every variable whose domain is reduced by a
+    propagation has its activity bumped, and all activities decay by the
+    given factor at each propagation (implemented by growing the bump, as
+    in VSIDS). Variables are chosen by largest activity / domain size and
+    values by the fewest variables their propagation touched on average.
+    Used like ImpactHeuristic; statistics persist across searches. '''
+
+    def __init__(self, decay=0.95):
+        self.decay = decay
+        self.inc = 1.0
+        self.activity = dict()        # var -> activity
+        self.val_activity = dict()    # (var, val) -> [average touched, samples]
+
+    def bump(self, var):
+        self.activity[var] = self.activity.get(var, 0.0) + self.inc
+
+    def propagated(self, csp, var, val, status, prunings):
+        touched = set(v for v, _ in prunings)
+        for v in touched:
+            self.bump(v)
+        if var is not None:
+            if not status:
+                self.bump(var)
+            avg = self.val_activity.get((var, val))
+            if avg is None:
+                self.val_activity[(var, val)] = [len(touched), 1]
+            else:
+                avg[1] += 1
+                avg[0] += (len(touched) - avg[0]) / avg[1]
+        self.inc /= self.decay
+        if self.inc > 1e100:
+            for v in self.activity:
+                self.activity[v] *= 1e-100
+            self.inc *= 1e-100
+
+    def var_ord(self, csp):
+        ''' the unassigned variable with the largest activity per value '''
+        best = None
+        best_key = None
+        for v in csp.get_all_unasgn_vars():
+            key = self.activity.get(v, 0.0) / v.cur_domain_size()
+            if best_key is None or key > best_key:
+                best = v
+                best_key = key
+        return best
 
-    ''' return variable according to the Minimum Remaining Values heuristic '''
-    
-    '''
-    num_v = []
-    var_store = []
-    for element in csp.get_all_vars():
-        var_store.append(element)
-    '''
-    variable_name = []
-    position = []
-    for i in csp.get_all_vars():
-        variable_name.append(i) #add all names into the list
-        position.append(i.domain())
-    temp = []
-    for elem in position:
-        temp.append(len(elem)) #record the num of the cons
-        item_to_add = min(temp)
-        index = temp.index(item_to_add)
-    return variable_name[index] #return the value with the index
+    def val_ord(self, csp, var):
+        ''' values whose propagation touched the fewest variables first '''
+        def touched(val):
+            avg = self.val_activity.get((var, val))
+            return avg[0] if avg else 0.0
+        return sorted(var.cur_domain(), key=touched)
 
 
+class PhaseSaving(SearchMonitor):
 
+    ''' Phase saving. Remembers the last value every variable was assigned
+    and tries it first the next time the variable is branched on, so
+    restarts and re-solves return to the part of the search space they
+    left. Hints (a dict variable name -> value, e.g. a near-solution) seed
+    the saved phases for a warm start. Phases are keyed by variable name,
+    so they carry over to a rebuilt model of a similar instance. Values
+    without a saved phase are ordered by fallback (a val_ord function) or
+    left in current domain order:
 
+        phases = PhaseSaving(hints)
+        solver.add_monitor(phases)
+        solver.bt_search(prop_GAC, ord_dom_wdeg, phases.val_ord) '''
 
+    def __init__(self, hints=None, fallback=None):
+        self.phase = dict(hints or {})  # var name -> saved value
+        self.fallback = fallback
 
+    def propagated(self, csp, var, val, status, prunings):
+        if var is not None and status:
+            self.phase[var.name] = val
 
+    def save_solution(self, csp):
+        ''' save the values of all assigned variables of csp as phases,
+        e.g. after a solve, to warm start the next one from it '''
+        for v in csp.get_all_vars():
+            if v.is_assigned():
+                self.phase[v.name] = v.get_assigned_value()
 
+    def val_ord(self, csp, var):
+        ''' the saved value of var first, then the rest of its domain '''
+        if self.fallback:
+            values = self.fallback(csp, var)
+        else:
+            values = var.cur_domain()
+        saved = self.phase.get(var.name)
+        if saved is None or not var.in_cur_domain(saved):
+            return values
+        return [saved] + [val for val in values if val != saved]
@@ -0,0 +1,184 @@
+# CISC 352 - W22
+# local_search.py
+# desc: min-conflicts local search over the CSP/Constraint model, an
+#       alternative to BT for large satisfiable problems.
+#
+
+'''Usage:
+
+       solver = MinConflicts(csp, seed=1)
+       if solver.search(max_steps=100000, time_limit=10):
+           csp.print_soln()             # variables assigned, as after BT
+       else:
+           print(solver.best_cost, solver.best)   # best assignment found
+
+   Search works on a complete assignment kept outside the Variables.
+   Each step picks a random variable that is in a violated constraint
+   (checked with Constraint.check) and moves it to the value violating
+   the fewest of its constraints. With probability noise it moves to a
+   random value instead (random walk). A variable may not return to a
+   value it just left for tabu steps, unless that would beat the best
+   cost so far. Every constraint's violation status and every variable's
+   conflict count are updated only for the constraints of the variable
+   that moved.
+
+   Variables that are already assigned are kept fixed at their value;
+   the others range over their current domains.
+'''
+
+import random
+import time
+
+from cspbase import *
+
+class MinConflicts:
+
+    def __init__(self, csp, seed=None):
+        '''csp == CSP object specifying the CSP to be solved'''
+        self.csp = csp
+        self.rng = random.Random(seed)
+        self.nSteps = 0
+        self.runtime = 0
+        self.best = None        #best assignment found, dict Variable -> value
+        self.best_cost = None   #its number of violated constraints
+
+    def violated(self, c):
+        '''Internal routine. True if c is violated by the current values'''
+        return not c.check([self.value[v] for v in c.scope])
+
+    def cost_with(self, var, val):
+        '''Internal routine. Number of var's constraints violated if var
+           took value val'''
+        old = self.value[var]
+        self.value[var] = val
+        cost = 0
+        for c in self.csp.vars_to_cons[var]:
+            if self.violated(c):
+                cost += 1
+        self.value[var] = old
+        return cost
+
+    def set_conflicted(self, var):
+        '''Internal routine. Keep var in the list of conflicted variables
+           exactly when it is free and in a violated constraint'''
+        inside = var in self.position
+        should = self.conflicts[var] > 0 and var not in self.fixed
+        if should and not inside:
+            self.position[var] = len(self.conflicted)
+            self.conflicted.append(var)
+        elif inside and not should:
+            i = self.position.pop(var)
+            last = self.conflicted.pop()
+            if last is not var:
+                self.conflicted[i] = last
+                self.position[last] = i
+
+    def move(self, var, val):
+        '''Internal routine. Give var value val and update violations and
+           conflict counts of its constraints'''
+        self.value[var] = val
+        for c in self.csp.vars_to_cons[var]:
+            now = self.violated(c)
+            if now != self.is_violated[c]:
+                self.is_violated[c] = now
+                delta = 1 if now else -1
+                self.cost += delta
+                for v in c.scope:
+                    self.conflicts[v] += delta
+                    self.set_conflicted(v)
+
+    def search(self, max_steps=100000, time_limit=None, noise=0.02, tabu=10,
+               initial=None, on_improve=None):
+        '''Run min-conflicts for at most max_steps steps and time_limit
+           seconds (None for no limit). initial optionally maps Variables
+           to starting values (others start at random). on_improve, if
+           given, is called as on_improve(cost, assignment) whenever a
+           better assignment is found.
+           Returns True if a solution was found, in which case the
+           variables are assigned to it; otherwise False, with the best
+           assignment found in self.best / self.best_cost.'''
+        stime = time.process_time()
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        rng = self.rng
+        csp = self.csp
+
+        self.fixed = set(v for v in csp.vars if v.is_assigned())
+        domains = dict((v, v.cur_domain()) for v in csp.vars)
+        if any(not dom for dom in domains.values()):
+            print("CSP {} has a variable with an empty domain".format(csp.name))
+            return False
+        self.value = dict()
+        for v in csp.vars:
+            if initial and v in initial and not v in self.fixed:
+                self.value[v] = initial[v]
+            else:
+                self.value[v] = rng.choice(domains[v])
+
+        self.is_violated = dict()
+        self.conflicts = dict((v, 0) for v in csp.vars)
+        self.cost = 0
+        for c in csp.cons:
+            self.is_violated[c] = self.violated(c)
+            if self.is_violated[c]:
+                self.cost += 1
+                for v in c.scope:
+                    self.conflicts[v] += 1
+        self.conflicted = []
+        self.position = dict()
+        for v in csp.vars:
+            self.set_conflicted(v)
+
+        self.best = dict(self.value)
+        self.best_cost = self.cost
+        if on_improve:
+            on_improve(self.cost, dict(self.best))
+        tabu_until = dict()
+        self.nSteps = 0
+
+        while self.cost > 0 and self.nSteps < max_steps and self.conflicted:
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            self.nSteps += 1
+            var = rng.choice(self.conflicted)
+            old = self.value[var]
+            choices = [val for val in domains[var] if val != old]
+            if not choices:
+                continue
+
+            if rng.random() < noise:
+                val = rng.choice(choices)
+            else:
+                here = self.cost_with(var, old)
+                best_vals = []
+                best_delta = None
+                for val in choices:
+                    delta = self.cost_with(var, val) - here
+                    if tabu_until.get((var, val), 0) >= self.nSteps and \
+                       self.cost + delta >= self.best_cost:
+                        continue    #tabu, and no new best
+                    if best_delta is None or delta < best_delta:
+                        best_vals = [val]
+                        best_delta = delta
+                    elif delta == best_delta:
+                        best_vals.append(val)
+                if not best_vals:
+                    continue
+                val = rng.choice(best_vals)
+
+            tabu_until[(var, old)] = self.nSteps + tabu
+            self.move(var, val)
+            if self.cost < self.best_cost:
+                self.best = dict(self.value)
+                self.best_cost = self.cost
+                if on_improve:
+                    on_improve(self.cost, dict(self.best))
+
+        self.runtime = time.process_time() - stime
+        if self.best_cost == 0:
+            for v in csp.vars:
+                if not v in self.fixed:
+                    if v.is_assigned():
+                        v.unassign()
+                    v.assign(self.best[v])
+            return True
+        return False
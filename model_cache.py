@@ -0,0 +1,217 @@
+# CISC 352 - W22
+# model_cache.py
+# desc: an on-disk cache of built CSP models (e.g. Cagey boards), so that
+#       identical models are loaded instead of being generated again.
+#
+
+'''Models are stored content addressed: the file name is a hash of the
+   builder function, the board and the builder options, so e.g.
+
+       csp, var_array = cached_model(cagey_csp_model, board)
+
+   builds the model the first time and loads it from the cache afterwards,
+   until the builder's module is edited. Boards and options that are not
+   plain JSON data (e.g. a function passed as an option), or that come
+   from a lambda or nested function, cannot be hashed reliably, so such
+   models are built every time and never cached.
+
+   File format (all integers little endian):
+
+       b'CSPM'  uint32 version  uint32 header length  header (JSON)  tables
+
+   The header lists the distinct domains, the variables (name, domain id,
+   index of the assigned value or -1), var_array as variable indices, the
+   constraints (name, scope as variable indices, table id) and for every
+   table its offset (from the end of the header), number of tuples, arity
+   and array typecode. A table
+   holds the satisfying tuples row by row, each value written as its code
+   (see Variable.codes), i.e. its index in the domain of the corresponding
+   scope variable (one byte per value for domains up to 256 values),
+   byteswapped on big endian hosts so that files are portable.
+   Identical tables, such as all the not-equal tables of a grid, are
+   stored once.
+
+   Files are read through mmap, and the codes of a table are read once,
+   split into the per-position columns constraints store tables in (see
+   Constraint.columns) and handed to every constraint using it without
+   decoding. Only models whose domain
+   values survive a JSON round trip (ints, strings, ...) are cached; any
+   other model is simply returned uncached, as is every model when the
+   cache directory cannot be written.
+'''
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from cspbase import *
+
+FORMAT_VERSION = 1
+MAGIC = b'CSPM'
+DEFAULT_CACHE_DIR = '.model_cache'
+
+def builder_version(builder):
+    '''Hash of the source file of the module defining builder, or None
+       if it cannot be read'''
+    module = sys.modules.get(builder.__module__)
+    try:
+        with open(module.__file__, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (AttributeError, TypeError, OSError):
+        return None
+
+def model_key(builder, board, options):
+    '''Hash identifying the model builder(board, **options), or None if
+       the model cannot be identified reliably'''
+    version = builder_version(builder)
+    if version is None or '<' in builder.__qualname__:
+        return None     # unreadable source, or a lambda/closure that may capture anything
+    try:
+        text = json.dumps([FORMAT_VERSION, builder.__module__, builder.__qualname__, version,
+                           board, options], sort_keys=True, allow_nan=False)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def cached_model(builder, board, cache_dir=DEFAULT_CACHE_DIR, **options):
+    '''Return (csp, var_array) as builder(board, **options) would, loading
+       it from cache_dir when it was built before'''
+    key = model_key(builder, board, options)
+    if key is None:
+        return builder(board, **options)
+    path = os.path.join(cache_dir, key + '.cspm')
+    if os.path.exists(path):
+        try:
+            return load_model(path)
+        except (OSError, ValueError, KeyError, IndexError, struct.error):
+            pass    # unreadable entry: rebuild and overwrite it
+    csp, var_array = builder(board, **options)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_model(path, csp, var_array)
+    except OSError:
+        pass    # cache not writable: the model is still good
+    return csp, var_array
+
+def json_safe(values):
+    '''True if values come back unchanged from JSON'''
+    try:
+        back = json.loads(json.dumps(values))
+    except (TypeError, ValueError):
+        return False
+    return back == values and [type(v) for v in back] == [type(v) for v in values]
+
+def save_model(path, csp, var_array):
+    '''Write csp and var_array to path. Returns False (writing nothing)
+       if the model cannot be cached.'''
+    var_index = dict((v, i) for i, v in enumerate(csp.vars))
+    if any(v not in var_index for v in var_array):
+        return False
+
+    domains = []
+    domain_index = dict()
+    variables = []
+    for v in csp.vars:
+        dom = v.domain()
+        if not json_safe(dom):
+            return False
+        key = json.dumps(dom)
+        if key not in domain_index:
+            domain_index[key] = len(domains)
+            domains.append(dom)
+        assigned = v.value_index(v.get_assigned_value()) if v.is_assigned() else -1
+        variables.append([v.name, domain_index[key], assigned])
+
+    blob = bytearray()
+    tables = []
+    table_index = dict()
+    cons = []
+    for c in csp.cons:
+        largest = max([v.domain_size() for v in c.scope] + [1])
+        typecode = code_typecode(largest)
+        arity = len(c.scope)
+        codes = array(typecode, [0]) * (c.n_tuples * arity)
+        for i, col in enumerate(c.columns):     # interleave the columns into rows
+            codes[i::arity] = array(typecode, col)
+        if sys.byteorder == 'big':
+            codes.byteswap()
+        data = codes.tobytes()
+        key = (typecode, len(c.scope), data)
+        if key not in table_index:
+            blob.extend(b'\0' * (-len(blob) % codes.itemsize))   # align
+            table_index[key] = len(tables)
+            tables.append([len(blob), c.n_tuples, arity, typecode])
+            blob.extend(data)
+        cons.append([c.name, [var_index[v] for v in c.scope], table_index[key]])
+
+    header = json.dumps({'name': csp.name, 'domains': domains, 'vars': variables,
+                         'var_array': [var_index[v] for v in var_array],
+                         'cons': cons, 'tables': tables}).encode('utf-8')
+    header += b' ' * (-(12 + len(header)) % 8)    # tables start 8-byte aligned
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + struct.pack('<II', FORMAT_VERSION, len(header)))
+            f.write(header)
+            f.write(blob)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except OSError:
+        os.unlink(tmp)
+        raise
+    return True
+
+def load_model(path):
+    '''Read a model written by save_model; return (csp, var_array)'''
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:4] != MAGIC:
+                raise ValueError("{} is not a cached model".format(path))
+            version, length = struct.unpack_from('<II', mm, 4)
+            if version != FORMAT_VERSION:
+                raise ValueError("{} has format version {}".format(path, version))
+            header = json.loads(bytes(mm[12:12 + length]).decode('utf-8'))
+            buf = memoryview(mm)[12 + length:]
+            try:
+                return build_model(header, buf)
+            finally:
+                buf.release()
+
+def build_model(header, buf):
+    '''Internal routine. Recreate the Variables and Constraints'''
+    domains = header['domains']
+    variables = []
+    for name, dom, assigned in header['vars']:
+        variables.append(Variable(name, domains[dom]))
+    csp = CSP(header['name'], variables)
+
+    decoded = dict()
+    for name, scope, table in header['cons']:
+        if table not in decoded:
+            offset, count, arity, typecode = header['tables'][table]
+            size = array(typecode).itemsize
+            codes = buf[offset:offset + count * arity * size].cast(typecode)
+            try:
+                if sys.byteorder == 'big' and size > 1:
+                    swapped = array(typecode, codes.tobytes())
+                    swapped.byteswap()
+                    flat = swapped.tolist()
+                else:
+                    flat = codes.tolist()
+            finally:
+                codes.release()
+            decoded[table] = ([flat[i::arity] for i in range(arity)], count)
+        c = Constraint(name, [variables[i] for i in scope])
+        c.add_code_columns(*decoded[table])
+        csp.add_constraint(c)
+
+    for v, (name, dom, assigned) in zip(variables, header['vars']):
+        if assigned >= 0:
+            v.assign(v.dom[assigned])
+    return csp, [variables[i] for i in header['var_array']]
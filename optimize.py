@@ -0,0 +1,198 @@
+# CISC 352 - W22
+# optimize.py
+# desc: branch and bound optimization on top of bt_search. An objective
+#       over some of the variables is minimized: every solution found
+#       tightens a bound that the propagators enforce, and the search
+#       continues until no better solution exists or the budget runs out.
+#
+
+'''Usage:
+
+       objective = NumDistinct(csp.get_all_vars())    #colours used
+       for value, solution in bb_search(csp, objective, prop_FC, time_limit=10):
+           print(value, solution)
+
+   bb_search is a generator: it yields (objective value, solution) each
+   time a strictly better solution is found, so the caller always holds
+   the best answer so far (anytime behaviour) and can stop whenever it
+   likes. A solution is a list of values in the order of csp.vars, as in
+   BT.solutions. For more control and statistics use BranchAndBound
+   directly; after its search, optimal tells whether the last solution
+   was proven optimal.
+
+   An objective is minimized; to maximize a weighted sum negate its
+   weights. Objectives implement
+
+       value()          the objective of the current (complete) assignment
+       lower_bound()    a value no completion of the current assignment
+                        and current domains can beat
+       prune(bound)     remove the values that cannot be part of a
+                        solution better than bound; returns (status,
+                        prunings) like a propagator
+
+   Each improving solution restarts bt_search with the tightened bound
+   (see bound_propagator). Pass a PhaseSaving monitor to make the restarts
+   go straight back to the region of the last solution.
+'''
+
+import time
+
+from cspbase import *
+
+class WeightedSum:
+
+    def __init__(self, vars, weights=None, constant=0):
+        '''Minimize constant + sum of weights[i] * vars[i] (all weights 1
+           by default). The domain values must be numbers.'''
+        self.vars = list(vars)
+        self.weights = list(weights) if weights is not None else [1] * len(self.vars)
+        self.constant = constant
+
+    def value(self):
+        return self.constant + sum(w * v.get_assigned_value()
+                                   for v, w in zip(self.vars, self.weights))
+
+    def best_term(self, var, w):
+        '''Internal routine. Smallest w * value over var's current domain'''
+        if w >= 0:
+            return w * min(var.cur_domain())
+        return w * max(var.cur_domain())
+
+    def lower_bound(self):
+        return self.constant + sum(self.best_term(v, w) for v, w in zip(self.vars, self.weights))
+
+    def prune(self, bound):
+        '''Remove every value whose term alone lifts the lower bound to
+           bound or more'''
+        lb = self.lower_bound()
+        if lb >= bound:
+            return False, []
+        prunings = []
+        for v, w in zip(self.vars, self.weights):
+            if v.is_assigned() or w == 0:
+                continue
+            rest = lb - self.best_term(v, w)
+            for val in v.cur_domain():
+                if rest + w * val >= bound:
+                    v.prune_value(val)
+                    prunings.append((v, val))
+            if v.cur_domain_size() == 0:
+                return False, prunings
+        return True, prunings
+
+class NumDistinct:
+
+    def __init__(self, vars):
+        '''Minimize the number of distinct values taken by vars, e.g. the
+           colours of a graph colouring'''
+        self.vars = list(vars)
+
+    def value(self):
+        return len(set(v.get_assigned_value() for v in self.vars))
+
+    def lower_bound(self):
+        '''The values already used, plus one if some unassigned variable
+           cannot take any of them'''
+        used = set(v.get_assigned_value() for v in self.vars if v.is_assigned())
+        for v in self.vars:
+            if not v.is_assigned() and not any(val in used for val in v.cur_domain()):
+                return len(used) + 1
+        return len(used)
+
+    def prune(self, bound):
+        '''Once bound - 1 values are used no new value may be taken'''
+        if self.lower_bound() >= bound:
+            return False, []
+        used = set(v.get_assigned_value() for v in self.vars if v.is_assigned())
+        prunings = []
+        if len(used) == bound - 1:
+            for v in self.vars:
+                if v.is_assigned():
+                    continue
+                for val in v.cur_domain():
+                    if not val in used:
+                        v.prune_value(val)
+                        prunings.append((v, val))
+                if v.cur_domain_size() == 0:
+                    return False, prunings
+        return True, prunings
+
+def bound_propagator(propagator, objective, bb):
+    '''Wrap propagator so that, after it has run, the values that cannot
+       beat bb.bound (None for no bound) are pruned as well'''
+    def propagate(csp, newVar=None):
+        status, prunings = propagator(csp, newVar)
+        if not status or bb.bound is None:
+            return status, prunings
+        status, pruned = objective.prune(bb.bound)
+        return status, prunings + pruned
+    return propagate
+
+class BranchAndBound:
+
+    def __init__(self, csp, objective):
+        '''csp == CSP object, objective == the objective to minimize'''
+        self.csp = csp
+        self.objective = objective
+        self.bound = None       #solutions must have an objective below it
+        self.best = None        #objective of the best solution found
+        self.solution = None    #best solution, a list of values in csp.vars order
+        self.optimal = False    #True once the best solution is proven optimal
+        self.nSolutions = 0
+        self.nDecisions = 0
+        self.nPrunings = 0
+        self.runtime = 0
+
+    def search(self, propagator, var_ord=None, val_ord=None, time_limit=None,
+               max_decisions=None, monitors=()):
+        '''Generator yielding (objective value, solution) for every
+           improving solution. time_limit (seconds) and max_decisions
+           bound the whole optimization. When it ends the csp's variables
+           are assigned to the best solution, if any.'''
+        start = time.perf_counter()
+        stime = time.process_time()
+        propagate = bound_propagator(propagator, self.objective, self)
+        try:
+            while True:
+                solver = BT(self.csp)
+                solver.quiet_on()
+                for m in monitors:
+                    solver.add_monitor(m)
+                decisions = None
+                if max_decisions is not None:
+                    decisions = max_decisions - self.nDecisions
+                    if decisions <= 0:
+                        break
+                remaining = None
+                if time_limit is not None:
+                    remaining = time_limit - (time.perf_counter() - start)
+                    if remaining <= 0:
+                        break
+                solver.set_limits(decisions, remaining)
+
+                status = solver.bt_search(propagate, var_ord, val_ord)
+                self.nDecisions += solver.nDecisions
+                self.nPrunings += solver.nPrunings
+                if status != True:
+                    #exhausted: nothing beats the bound
+                    self.optimal = status == False and self.solution is not None
+                    break
+                self.best = self.objective.value()
+                self.bound = self.best
+                self.solution = [v.get_assigned_value() for v in self.csp.vars]
+                self.nSolutions += 1
+                self.runtime = time.process_time() - stime
+                yield self.best, list(self.solution)
+        finally:
+            self.runtime = time.process_time() - stime
+            if self.solution is not None:
+                for var, val in zip(self.csp.vars, self.solution):
+                    if var.is_assigned():
+                        var.unassign()
+                    var.assign(val)
+
+def bb_search(csp, objective, propagator, var_ord=None, val_ord=None, time_limit=None,
+              max_decisions=None, monitors=()):
+    '''Minimize objective over the solutions of csp; see BranchAndBound.search'''
+    return BranchAndBound(csp, objective).search(propagator, var_ord, val_ord, time_limit,
+                                                 max_decisions, monitors)
@@ -45,6 +45,11 @@
       NOTE propagator SHOULD NOT prune a value that has already been
       pruned! Nor should it prune a value twice
 
+      When a deadend is detected the propagator reports the constraint
+      responsible for it by calling that constraint's inc_weight method.
+      These conflict weights drive the dom/wdeg variable ordering
+      (see heuristics.ord_dom_wdeg).
+
       PROPAGATOR called with newly_instantiated_variable = None
       PROCESSING REQUIRED:
         for plain backtracking (where we only check fully instantiated
@@ -84,6 +89,7 @@ def prop_BT(csp, newVar=None):
             for var in vars:
                 vals.append(var.get_assigned_value())
             if not c.check(vals):
+                c.inc_weight()
                 return False, []
     return True, []
 
@@ -107,6 +113,7 @@ def prop_FC(csp, newVar=None):
                         c0.prune_value(d_element) # delete it.
                         vals.append(path)
             if c0.cur_domain_size() == 0: # Meaning we prune every domain from c0, reaching deadend.
+                c.inc_weight()
                 return False, vals
     return True, vals
 
@@ -133,6 +140,7 @@ def prop_GAC(csp, newVar=None):
                         v.prune_value(d) # Delete it.
                         vals.append(path)
                     if v.cur_domain_size() == 0: # Meaning we prune every domain from v, reaching deadend.
+                        c0.inc_weight()
                         return False, vals
                     else:
                         for neighbors in csp.get_cons_with_var(v):
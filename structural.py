@@ -0,0 +1,220 @@
+# CISC 352 - W22
+# structural.py
+# desc: a solver that exploits the structure of the constraint graph.
+#       Tree-structured problems are solved without search by directional
+#       arc consistency; other problems by cycle-cutset conditioning.
+#
+
+'''The constraint graph joins two variables when some constraint of
+   CSP.vars_to_cons has both in its scope. If the graph is a forest,
+   each tree is made directionally arc consistent from the leaves up
+   (every parent value keeps a support in each child), after which values
+   can be picked from the root down without ever backtracking: linear in
+   the number of variables.
+
+   Otherwise a cycle cutset is chosen: a set of variables whose removal
+   leaves a forest. Its assignments are enumerated, and each consistent one
+   conditions the remaining variables, whose constraints now have at most
+   two unassigned variables, and the forest is solved as above. This costs
+   d^|cutset| tree solves instead of d^n, so it pays off on sparse,
+   nearly tree-shaped graphs such as map colouring.
+
+       solver = StructuralSolver(csp)
+       if solver.solve():
+           csp.print_soln()
+
+   Variables that are already assigned are kept at their value.
+'''
+
+import time
+
+from cspbase import *
+
+def constraint_graph(csp, vars=None):
+    '''Return the constraint graph over vars (default all variables) as a
+       dict Variable -> set of neighbouring Variables'''
+    if vars is None:
+        vars = csp.get_all_vars()
+    inside = set(vars)
+    graph = dict((v, set()) for v in vars)
+    for v in vars:
+        for c in csp.vars_to_cons[v]:
+            for w in c.scope:
+                if w is not v and w in inside:
+                    graph[v].add(w)
+    return graph
+
+def cycle_cutset(graph):
+    '''Greedily choose a set of vertices whose removal leaves the graph
+       acyclic: strip vertices of degree <= 1 (they cannot be on a cycle),
+       and when none are left move a vertex of highest degree to the
+       cutset. Returns the cutset as a list.'''
+    graph = dict((v, set(ns)) for v, ns in graph.items())
+    cutset = []
+
+    def remove(v):
+        for w in graph.pop(v):
+            graph[w].discard(v)
+
+    while graph:
+        leaves = [v for v, ns in graph.items() if len(ns) <= 1]
+        if leaves:
+            for v in leaves:
+                if v in graph:
+                    remove(v)
+        else:
+            v = max(graph, key=lambda v: len(graph[v]))
+            cutset.append(v)
+            remove(v)
+    return cutset
+
+class StructuralSolver:
+
+    def __init__(self, csp):
+        '''csp == CSP object specifying the CSP to be solved'''
+        self.csp = csp
+        self.nCutsetAssignments = 0 #consistent cutset assignments tried
+        self.nChecks = 0            #constraint checks made
+        self.cutset = []
+        self.runtime = 0
+
+    def solve(self):
+        '''Return True and assign the variables if the CSP has a solution,
+           False otherwise'''
+        stime = time.process_time()
+        csp = self.csp
+        self.nCutsetAssignments = 0
+        self.nChecks = 0
+
+        self.value = dict()
+        for v in csp.vars:
+            if v.is_assigned():
+                self.value[v] = v.get_assigned_value()
+        free = [v for v in csp.vars if not v.is_assigned()]
+        self.cutset = cycle_cutset(constraint_graph(csp, free))
+        in_cutset = set(self.cutset)
+        self.rest = [v for v in free if not v in in_cutset]
+
+        #constraints joining two (or constraining one) of the remaining
+        #variables once the cutset is assigned
+        rest = set(self.rest)
+        self.edges = dict()
+        self.unary = dict((v, []) for v in self.rest)
+        for c in csp.cons:
+            left = [v for v in c.scope if v in rest]
+            if len(left) == 1:
+                self.unary[left[0]].append(c)
+            elif len(left) == 2:
+                self.edges.setdefault((left[0], left[1]), []).append(c)
+                self.edges.setdefault((left[1], left[0]), []).append(c)
+        self.tree_graph = constraint_graph(csp, self.rest)
+
+        status = self.assign_cutset(0)
+        if status:
+            for v in csp.vars:
+                if not v.is_assigned():
+                    v.assign(self.value[v])
+        self.runtime = time.process_time() - stime
+        return status
+
+    def check(self, c):
+        '''Internal routine. Check c under the values in self.value'''
+        self.nChecks += 1
+        return c.check([self.value[v] for v in c.scope])
+
+    def assign_cutset(self, i):
+        '''Internal routine. Enumerate consistent assignments of the cutset
+           variables from index i on, solving the remaining forest under
+           each complete one'''
+        if i == len(self.cutset):
+            self.nCutsetAssignments += 1
+            return self.solve_forest()
+        var = self.cutset[i]
+        for val in var.cur_domain():
+            self.value[var] = val
+            ok = True
+            for c in self.csp.vars_to_cons[var]:
+                if all(v in self.value for v in c.scope) and not self.check(c):
+                    ok = False
+                    break
+            if ok and self.assign_cutset(i + 1):
+                return True
+            del self.value[var]
+        return False
+
+    def solve_forest(self):
+        '''Internal routine. Solve the remaining variables, whose graph is
+           a forest, by directional arc consistency and a backtrack-free
+           top-down pass'''
+        value = self.value
+        doms = dict()
+        for v in self.rest:
+            dom = []
+            for val in v.cur_domain():
+                value[v] = val
+                if all(self.check(c) for c in self.unary[v]):
+                    dom.append(val)
+            del value[v]
+            if not dom:
+                return self.clear_forest()
+            doms[v] = dom
+
+        seen = set()
+        for root in self.rest:
+            if root in seen:
+                continue
+            #order the tree breadth first from root
+            order = [root]
+            parent = {root: None}
+            seen.add(root)
+            for v in order:
+                for w in self.tree_graph[v]:
+                    if w not in seen:
+                        seen.add(w)
+                        parent[w] = v
+                        order.append(w)
+
+            #directional arc consistency, leaves first
+            for child in reversed(order[1:]):
+                up = parent[child]
+                kept = [a for a in doms[up] if self.supported(up, a, child, doms[child])]
+                if not kept:
+                    return self.clear_forest()
+                doms[up] = kept
+
+            #assign from the root down
+            value[root] = doms[root][0]
+            for child in order[1:]:
+                up = parent[child]
+                for b in doms[child]:
+                    if self.consistent(up, value[up], child, b):
+                        value[child] = b
+                        break
+        return True
+
+    def clear_forest(self):
+        '''Internal routine. Drop the values of trees solved before a
+           failed one, so they do not constrain the next cutset assignment;
+           returns False'''
+        for v in self.rest:
+            self.value.pop(v, None)
+        return False
+
+    def consistent(self, x, a, y, b):
+        '''Internal routine. True if x=a, y=b satisfy all constraints
+           between x and y'''
+        old_x = self.value.get(x)
+        old_y = self.value.get(y)
+        self.value[x] = a
+        self.value[y] = b
+        ok = all(self.check(c) for c in self.edges.get((x, y), ()))
+        for var, old in ((x, old_x), (y, old_y)):
+            if old is None:
+                del self.value[var]
+            else:
+                self.value[var] = old
+        return ok
+
+    def supported(self, x, a, y, dom):
+        '''Internal routine. True if some value of dom supports x=a'''
+        return any(self.consistent(x, a, y, b) for b in dom)
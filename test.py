@@ -2,8 +2,26 @@ from cspbase import *
 from cagey_csp import *
 from propagators import *
 from heuristics import *
-
+from cagey_bitmask import *
+from local_search import *
+from structural import *
+import benchmark
+import cagey_batch
+import model_cache
+from compiled import *
+from optimize import *
+from async_solve import *
+from cagey_gen import generate_board, cage_clue
+
+import asyncio
+import io
 import itertools
+import random
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 import platform
 import signal
 import traceback
@@ -327,9 +345,1164 @@ def test_mrv():
 
     return score, details
 
+def test_dom_wdeg():
+    '''Weights bumped by a failing constraint should steer ord_dom_wdeg'''
+    score = 0
+    details = ''
+    try:
+        a = Variable('A', [1, 2])
+        b = Variable('B', [1, 2])
+        c = Variable('C', [1, 2])
+        ab = Constraint('C(A,B)', [a, b])
+        ab.add_satisfying_tuples([(1, 2), (2, 1)])
+        bc = Constraint('C(B,C)', [b, c])
+        bc.add_satisfying_tuples([(1, 1), (2, 2)])
+        spare = Constraint('C(A,C)', [a, c])   # never added to the CSP
+        unattached = a.wdeg == 0 and b.ddeg == 0 and not a.cons
+        csp = CSP('Wdeg', [a, b, c])
+        csp.add_constraint(ab)
+        csp.add_constraint(bc)
+
+        # B has weighted degree 2, A and C only 1
+        first = ord_dom_wdeg(csp)
+
+        # a wipeout through C(B,C) bumps its weight (C: 1 value / wdeg 2)
+        b.assign(1)
+        c.prune_value(1)
+        status, prunings = prop_FC(csp, b)
+        for var, val in prunings:
+            var.unprune_value(val)
+        b.unassign()
+        second = ord_dom_wdeg(csp)
+
+        if unattached and first is b and not status and bc.weight == 2 and b.wdeg == 3 and second is c:
+            a.assign(1)   # A assigned: B only keeps C(B,C) in its weighted degree
+            if b.wdeg == 2 and c.wdeg == 2 and ab.get_n_unasgn() == 1:
+                score = 1
+        if not score:
+            details = "Failed dom/wdeg test: weighted degrees don't match expected results"
+    except Exception:
+        details = "One or more runtime errors occurred while testing dom/wdeg: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_lcv():
+    '''val_lcv should follow the cached support counts as domains change'''
+    score = 0
+    details = ''
+    try:
+        a = Variable('A', [1, 2, 3])
+        b = Variable('B', [1, 2, 3])
+        lt = Constraint('C(A<B)', [a, b])
+        lt.add_satisfying_tuples([t for t in itertools.product([1, 2, 3], repeat=2) if t[0] < t[1]])
+        csp = CSP('LCV', [a, b])
+        csp.add_constraint(lt)
+
+        orders = [val_lcv(csp, a), val_lcv(csp, b)]
+        a.prune_value(1)
+        orders.append(val_lcv(csp, b))
+        a.unprune_value(1)
+        orders.append(val_lcv(csp, b))
+
+        if orders == [[1, 2, 3], [3, 2, 1], [3, 1, 2], [3, 2, 1]] and lt.get_sup_count(b, 2) == 1:
+            score = 1
+        else:
+            details = "Failed LCV test: value orders don't match expected results"
+    except Exception:
+        details = "One or more runtime errors occurred while testing LCV: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_cage_tables():
+    '''cage_tuples should match filtering every combination with cagey_check'''
+    score = 0
+    details = ''
+    try:
+        cages = [(7, [(1,1), (1,2), (2,1)], '+'), (12, [(1,1), (2,2), (3,3)], '*'),
+                 (1, [(2,1), (2,2), (3,1)], '-'), (2, [(1,3), (2,3)], '/'),
+                 (3, [(1,1), (1,2), (1,3)], '?'), (4, [(3,3)], '?')]
+        n = 4
+        for target, cells, op in cages:
+            ops = ["+","-","*","/"] if op == '?' and len(cells) > 1 else [op]
+            shape = cage_shape(cells)
+            expected = set()
+            for o in ops:
+                for t in itertools.product(range(1, n+1), repeat=len(cells)):
+                    if all(t[i] != t[j] for i, j in shape) and cagey_check(target, list(t) + [o]):
+                        expected.add(t + (o,))
+            tuples = cage_tuples(target, op, cells, n)
+            if set(tuples) != expected or len(tuples) != len(expected):
+                details = "Failed cage table test: tuples for cage {} don't match".format((target, cells, op))
+                return score, details
+        score = 1
+    except Exception:
+        details = "One or more runtime errors occurred while testing cage tables: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_cagey_bitmask():
+    '''The bitmask engine should agree with the generic model'''
+    score = 0
+    details = ''
+    try:
+        board = (3, [(3,[(1,1), (2,1)],'+'),(1, [(1,2)], '?'), (8, [(1,3), (2,3), (2,2)], "+"), (3, [(3,1)], '?'), (3, [(3,2), (3,3)], "+")])
+        solver = CageyBitmask(board)
+        csp, var_array = cagey_csp_model(board)
+        if not solver.solve():
+            details = "Failed bitmask test: no solution found"
+        elif [v.name for v in solver.var_array] != [v.name for v in var_array]:
+            details = "Failed bitmask test: var_array layout doesn't match cagey_csp_model"
+        elif [v.get_assigned_value() for v in solver.var_array] != [2, 1, 3, 1, 3, 2, 3, 2, 1, '+', '?', '+', '?', '+']:
+            details = "Failed bitmask test: solution doesn't match expected results"
+        elif bitmask_solve((2, [(3, [(1,1)], '+')])) is not None:
+            details = "Failed bitmask test: solved a board with no solution"
+        else:
+            score = 1
+    except Exception:
+        details = "One or more runtime errors occurred while testing the bitmask engine: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_cagey_unique():
+    '''cagey_unique should accept the sample board and reject an empty grid'''
+    score = 0
+    details = ''
+    try:
+        board = (3, [(3,[(1,1), (2,1)],'+'),(1, [(1,2)], '?'), (8, [(1,3), (2,3), (2,2)], "+"), (3, [(3,1)], '?'), (3, [(3,2), (3,3)], "+")])
+        unique, grids = cagey_unique(board)
+        empty_unique, empty_grids = cagey_unique((3, []))
+        if unique and grids == [[2, 1, 3, 1, 3, 2, 3, 2, 1]] and empty_unique == False and len(empty_grids) == 2:
+            score = 1
+        else:
+            details = "Failed uniqueness test: results don't match expected results"
+    except Exception:
+        details = "One or more runtime errors occurred while testing uniqueness: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_min_conflicts():
+    '''Min-conflicts should solve 8 queens and respect fixed variables'''
+    score = 0
+    details = ''
+    try:
+        queens = nQueens(8)
+        curr_vars = queens.get_all_vars()
+        curr_vars[0].assign(1)
+        solver = MinConflicts(queens, seed=352)
+        solved = solver.search(max_steps=10000)
+        ok = all(c.check([v.get_assigned_value() for v in c.get_scope()]) for c in queens.get_all_cons())
+        if solved and ok and solver.best_cost == 0 and curr_vars[0].get_assigned_value() == 1:
+            score = 1
+        else:
+            details = "Failed min-conflicts test: 8 queens not solved"
+    except Exception:
+        details = "One or more runtime errors occurred while testing min-conflicts: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_structural():
+    '''The structural solver should colour a map with a one-region cycle
+       cutset, find that an odd cycle is not 2-colourable, and retry the
+       cutset after one tree of the forest fails'''
+    score = 0
+    details = ''
+    try:
+        dom = ['R', 'G', 'B']
+        names = ['WA', 'NT', 'QL', 'SA', 'NSW', 'V', 'T']
+        regions = dict((name, Variable(name, dom)) for name in names)
+        aus = CSP("Colour Australia", list(regions.values()))
+        for a, b in [('T', 'V'), ('V', 'SA'), ('V', 'NSW'), ('NSW', 'QL'), ('NSW', 'SA'),
+                     ('QL', 'NT'), ('QL', 'SA'), ('NT', 'SA'), ('NT', 'WA'), ('WA', 'SA')]:
+            c = Constraint('C({},{})'.format(a, b), [regions[a], regions[b]])
+            c.add_satisfying_tuples([t for t in itertools.product(dom, repeat=2) if t[0] != t[1]])
+            aus.add_constraint(c)
+        solver = StructuralSolver(aus)
+        coloured = solver.solve() and solver.cutset == [regions['SA']] and \
+                   all(c.check([v.get_assigned_value() for v in c.get_scope()]) for c in aus.get_all_cons())
+
+        ring = [Variable('R{}'.format(i), [0, 1]) for i in range(5)]
+        cycle = CSP("Odd cycle", ring)
+        for i in range(5):
+            c = Constraint('C{}'.format(i), [ring[i], ring[(i+1) % 5]])
+            c.add_satisfying_tuples([[0, 1], [1, 0]])
+            cycle.add_constraint(c)
+        refuted = not StructuralSolver(cycle).solve()
+
+        #with A=1 the tree R2-R3 fails after the tree R1 was solved;
+        #R1's value must not then rule out A=2
+        names = {'R1': [1, 2], 'A': [1, 2], 'B': [1, 2, 3], 'C': [1, 2, 3],
+                 'R2': [1, 3], 'R3': [1, 3]}
+        vs = dict((name, Variable(name, d)) for name, d in names.items())
+        forest = CSP("Forest", list(vs.values()))
+        for a, b in [('A', 'B'), ('B', 'C'), ('A', 'C'), ('R1', 'A'), ('R2', 'A'),
+                     ('R3', 'A'), ('R2', 'R3')]:
+            c = Constraint('C({},{})'.format(a, b), [vs[a], vs[b]])
+            c.add_satisfying_tuples([t for t in itertools.product(names[a], names[b]) if t[0] != t[1]])
+            forest.add_constraint(c)
+        solver = StructuralSolver(forest)
+        retried = solver.solve() and solver.cutset == [vs['A']] and \
+                  all(c.check([v.get_assigned_value() for v in c.get_scope()]) for c in forest.get_all_cons())
+
+        if coloured and refuted and retried:
+            score = 1
+        else:
+            details = "Failed structural solver test: wrong colouring or cutset"
+    except Exception:
+        details = "One or more runtime errors occurred while testing the structural solver: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_components():
+    '''Independent sub-problems should be found and solved separately,
+       so that an unsolvable one is detected without backtracking
+       through the others'''
+    score = 0
+    details = ''
+    try:
+        def batch(sizes):
+            parts = [nQueens(n) for n in sizes]
+            csp = CSP("Batch", [v for p in parts for v in p.get_all_vars()])
+            for p in parts:
+                for c in p.get_all_cons():
+                    csp.add_constraint(c)
+            return csp
+
+        def solved(csp):
+            return all(c.check([v.get_assigned_value() for v in c.get_scope()]) for c in csp.get_all_cons())
+
+        csp = batch([6, 8, 3])
+        found = [len(comp) for comp in csp.components()] == [6, 8, 3]
+        solver = BT(csp)
+        solver.quiet_on()
+        refuted = solver.solve_components(prop_FC, ord_dom_ddeg) == False
+        solver.split_on()
+        refuted = refuted and solver.bt_search(prop_FC) == False and solver.nDecisions < 1000
+
+        csp = batch([4, 6, 8])
+        solver = BT(csp)
+        solver.quiet_on()
+        parallel = solver.solve_components(prop_GAC, ord_dom_ddeg, workers=2) and solved(csp)
+        solver.split_on()
+        split = solver.bt_search(prop_FC, ord_dom_ddeg) and solved(csp)
+
+        if found and refuted and parallel and split:
+            score = 1
+        else:
+            details = "Failed component test: components not found or not solved independently"
+    except Exception:
+        details = "One or more runtime errors occurred while testing components: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_benchmark():
+    '''A benchmark run should record its measurements, and comparing it
+       with a baseline should flag a case that got worse'''
+    score = 0
+    details = ''
+    try:
+        case = benchmark.run_case('australia', 7, 'FC', 'dom_wdeg', 'none', repeat=2)
+        recorded = case['status'] == 'solved' and case['decisions'] == 7 and \
+                   all(key in case for key in ['wall', 'cpu', 'build_time', 'prunings', 'peak_memory'])
+        baseline = {'results': [case]}
+        same = benchmark.compare_results(baseline, {'results': [dict(case)]}) == []
+        worse = dict(case, decisions=case['decisions'] * 2, status='timeout')
+        flagged = [r[1] for r in benchmark.compare_results(baseline, {'results': [worse]})] == ['status']
+        worse['status'] = 'solved'
+        flagged = flagged and [r[1] for r in benchmark.compare_results(baseline, {'results': [worse]})] == ['decisions']
+        other = benchmark.run_case('queens', 6, 'FC', 'impact', 'none', repeat=1, memory=False)
+        flagged = flagged and other['status'] == 'solved' and \
+                  [r[1] for r in benchmark.compare_results(baseline, {'results': [other]})] == ['missing']
+        ordered = all(name in benchmark.VAR_ORDERS for name in ['mrv', 'impact', 'activity'])
+        if recorded and same and flagged and ordered:
+            score = 1
+        else:
+            details = "Failed benchmark test: measurements missing or regressions not flagged"
+    except Exception:
+        details = "One or more runtime errors occurred while testing the benchmark: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_compiled():
+    '''The compiled engine should enumerate the same solutions as
+       bt_search, also when run in slices, and solve a Cagey model'''
+    score = 0
+    details = ''
+    try:
+        counts = []
+        for prop in ['BT', 'FC', 'GAC']:
+            search = CompiledSearch(compile_csp(nQueens(6)), prop)
+            found = 0
+            while True:
+                status = search.run(max_nodes=5)
+                if status == False:
+                    break
+                if status:
+                    found += 1
+            counts.append(found)
+
+        board, square = generate_board(5, 1)
+        csp, var_array = cagey_csp_model(board)
+        solved = compiled_solve(csp, 'GAC') and \
+                 all(c.check([v.get_assigned_value() for v in c.get_scope()]) for c in csp.get_all_cons())
+
+        if counts == [4, 4, 4] and solved:
+            score = 1
+        else:
+            details = "Failed compiled engine test: got {} solutions of 6 queens".format(counts)
+    except Exception:
+        details = "One or more runtime errors occurred while testing the compiled engine: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_value_codes():
+    '''Constraints over non-numeric values should behave as before when
+       the values are stored as codes, also after the domain grows'''
+    score = 0
+    details = ''
+    try:
+        x = Variable('X', ['red', 'green'])
+        y = Variable('Y', ['red', 'green'])
+        c = Constraint('C', [x, y])
+        c.add_satisfying_tuples([('red', 'green'), ('green', 'red'), ('blue', 'red')])
+        x.add_domain_values(['blue'])
+        c.add_satisfying_tuples([('blue', 'green')])
+
+        ok = c.check(['red', 'green']) and not c.check(['red', 'red']) and \
+             not c.check(['pink', 'red']) and c.check(['blue', 'green'])
+        ok = ok and set(c.sat_tuples) == {('red', 'green'), ('green', 'red'), ('blue', 'green')}
+        y.prune_value('green')
+        ok = ok and not c.has_support(x, 'red') and c.has_support(x, 'green') and \
+             not c.has_support(x, 'blue')
+        c.init_sup_counts()
+        y.unprune_value('green')
+        ok = ok and c.get_sup_count(x, 'blue') == 1 and c.get_sup_count(y, 'green') == 2
+        y.assign('red')
+        ok = ok and c.get_sup_count(y, 'green') == 0 and c.get_sup_count(x, 'green') == 1
+        y.unassign()
+
+        #the value views are read-only
+        ok = ok and c.sup_tuples[(x, 'blue')] == (('blue', 'green'),) and \
+             not (y, 'pink') in c.sup_tuples and len(c.sat_tuples) == 3
+        try:
+            c.sat_tuples[('red', 'red')] = True
+            ok = False
+        except TypeError:
+            pass
+        ok = ok and not c.check(['red', 'red'])
+
+        #a sparse table over large domains keeps its keys in a set
+        big = Variable('Big', list(range(1000)))
+        sparse = Constraint('Sparse', [big, x])
+        sparse.add_satisfying_tuples([(999, 'blue'), (0, 'red')])
+        ok = ok and sparse.bits is None and sparse.check([999, 'blue']) and \
+             not sparse.check([999, 'red']) and sparse.has_support(big, 0)
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed value code test: wrong checks, supports or support counts"
+    except Exception:
+        details = "One or more runtime errors occurred while testing value codes: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_shared_model():
+    '''Concurrent solve_model calls under different givens should share
+       one compiled model and give the same answers as serial calls'''
+    score = 0
+    details = ''
+    try:
+        board, square = generate_board(5, 1)
+        csp, var_array = cagey_csp_model(board)
+        model = compile_csp(csp)
+        first = solve_model(model)
+        cells = [v.name for v in var_array[:25]]
+        queries = [None] + [{cells[i]: first[cells[i]]} for i in range(0, 25, 3)]
+        queries.append({cells[0]: first[cells[0]] % 5 + 1, cells[1]: first[cells[0]]})
+        queries.append({cells[0]: 'no such value'})
+
+        serial = [solve_model(model, q) for q in queries]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            parallel = list(pool.map(lambda q: solve_model(model, q), queries * 4))
+
+        ok = parallel == serial * 4 and serial[-1] is None
+        for q, sol in zip(queries, serial):
+            if sol is None:
+                continue
+            ok = ok and all(sol[name] == value for name, value in (q or {}).items())
+            codes = [model.codes[v][sol[model.names[v]]] for v in range(len(model.vars))]
+            ok = ok and all(model.holds(k, tuple(codes[v] for v in scope))
+                            for k, scope in enumerate(model.scopes))
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed shared model test: concurrent answers differ or violate givens"
+    except Exception:
+        details = "One or more runtime errors occurred while testing the shared model: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_snapshots():
+    '''Restoring a snapshot should undo assignments and prunings made
+       since, including propagation, and leave the incremental
+       bookkeeping as it was; a forked SearchState should be independent'''
+    score = 0
+    details = ''
+    try:
+        csp = nQueens(6)
+        for c in csp.get_all_cons():
+            c.init_sup_counts()
+        vars = csp.get_all_vars()
+
+        def state():
+            return ([(v.get_assigned_value(), v.cur_domain(), v.ddeg) for v in vars],
+                    [[list(row) for row in c.sup_count] for c in csp.get_all_cons()])
+
+        start = state()
+        outer = csp.snapshot()
+        vars[0].assign(1)
+        prop_GAC(csp, vars[0])
+        middle = state()
+        inner = csp.snapshot()
+        vars[2].prune_value(vars[2].cur_domain()[0])
+        vars[1].assign(vars[1].cur_domain()[0])
+        prop_FC(csp, vars[1])
+        csp.restore(inner)
+        ok = state() == middle
+        vars[3].assign(vars[3].cur_domain()[-1])
+        csp.restore(inner)
+        ok = ok and state() == middle
+        csp.release(inner)
+        kept = csp.snapshot()
+        vars[4].assign(vars[4].cur_domain()[0])
+        prop_GAC(csp, vars[4])
+        csp.release(kept)
+        csp.restore(outer)
+        ok = ok and state() == start
+        csp.release(outer)
+        ok = ok and csp.changes == [] and all(v.recorder is None for v in vars)
+
+        model = compile_csp(nQueens(6))
+        state_a = SearchState(model, {'Q1': 2})
+        state_b = state_a.fork()
+        mark = state_b.mark()
+        state_b.set_dom(1, 1)
+        ok = ok and state_a.dom == [2] + list(model.masks[1:])
+        state_b.undo(mark)
+        ok = ok and state_b.dom == state_a.dom
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed snapshot test: restored state differs from the snapshot"
+    except Exception:
+        details = "One or more runtime errors occurred while testing snapshots: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_incremental():
+    '''Incremental bt_search should answer like a fresh search under
+       assumptions and added or retracted constraints, reusing the
+       propagated root whenever it is still valid'''
+    score = 0
+    details = ''
+    try:
+        board, square = generate_board(5, 1)
+        csp, var_array = cagey_csp_model(board)
+        cells = var_array[:25]
+        roots = []
+
+        def counting_GAC(csp, newVar=None):
+            if newVar is None:
+                roots.append(newVar)
+            return prop_GAC(csp, newVar)
+
+        def fresh(assumptions=None):
+            solver = BT(csp)
+            solver.quiet_on()
+            return solver.bt_search(prop_GAC, ord_dom_wdeg, assumptions=assumptions)
+
+        solver = BT(csp)
+        solver.quiet_on()
+        solver.incremental_on()
+        ok = solver.bt_search(counting_GAC, ord_dom_wdeg) == True
+        sol = [v.get_assigned_value() for v in cells]
+
+        hints = [(cells[i], sol[i]) for i in (0, 7, 14)]
+        ok = ok and solver.bt_search(counting_GAC, ord_dom_wdeg, assumptions=hints) == True
+        ok = ok and all(var.get_assigned_value() == val for var, val in hints)
+        other = [(cells[0], sol[0] % 5 + 1)]
+        ok = ok and solver.bt_search(counting_GAC, ord_dom_wdeg, assumptions=other) == fresh(other)
+        ok = ok and not cells[0].is_assigned()
+
+        ban = Constraint('ban', [cells[0]])
+        ban.add_satisfying_tuples([(val,) for val in cells[0].domain() if val != sol[0]])
+        csp.add_constraint(ban)
+        ok = ok and solver.bt_search(counting_GAC, ord_dom_wdeg) == fresh()
+        csp.remove_constraint(ban)
+        ok = ok and solver.bt_search(counting_GAC, ord_dom_wdeg) == True
+        ok = ok and len(roots) == 3 and not ban in cells[0].cons
+        solver.incremental_off()
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed incremental test: answers differ from fresh searches or the root was not reused"
+    except Exception:
+        details = "One or more runtime errors occurred while testing incremental search: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_phase_saving():
+    '''Saved phases should be tried first, and a warm start from a
+       solution should solve a rebuilt model without backtracking'''
+    score = 0
+    details = ''
+    try:
+        board, square = generate_board(6, 2)
+        csp, var_array = cagey_csp_model(board)
+        phases = PhaseSaving()
+        solver = BT(csp)
+        solver.quiet_on()
+        solver.add_monitor(phases)
+        ok = solver.bt_search(prop_FC, ord_dom_wdeg, phases.val_ord) == True
+        solution = dict((v.name, v.get_assigned_value()) for v in var_array)
+        ok = ok and all(phases.phase[name] == val for name, val in solution.items()
+                        if name.startswith('Cell'))
+        saved = PhaseSaving()
+        saved.save_solution(csp)
+        ok = ok and saved.phase == solution
+
+        csp, var_array = cagey_csp_model(board)
+        warm = PhaseSaving(solution, fallback=val_lcv)
+        solver = BT(csp)
+        solver.quiet_on()
+        ok = ok and solver.bt_search(prop_FC, ord_dom_wdeg, warm.val_ord) == True
+        ok = ok and solver.nDecisions <= len(var_array)
+        ok = ok and all(v.get_assigned_value() == solution[v.name] for v in var_array)
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed phase saving test: saved phases not used or warm start backtracked"
+    except Exception:
+        details = "One or more runtime errors occurred while testing phase saving: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_optimize():
+    '''Branch and bound should stream strictly improving solutions and
+       end with a proven optimum'''
+    score = 0
+    details = ''
+    try:
+        #a 5-cycle around a hub needs four colours
+        dom = [1, 2, 3, 4, 5, 6]
+        wheel = [Variable('V{}'.format(i), dom) for i in range(6)]
+        csp = CSP('wheel', wheel)
+        for i in range(5):
+            for x, y in ((wheel[i], wheel[(i + 1) % 5]), (wheel[5], wheel[i])):
+                c = Constraint('C({},{})'.format(x.name, y.name), [x, y])
+                c.add_satisfying_tuples([(a, b) for a in dom for b in dom if a != b])
+                csp.add_constraint(c)
+        colours = BranchAndBound(csp, NumDistinct(wheel))
+        values = [value for value, solution in colours.search(prop_FC, ord_dom_ddeg)]
+        ok = values[-1] == 4 and colours.optimal and \
+             len(set(v.get_assigned_value() for v in wheel)) == 4
+
+        queens = nQueens(8)
+        solver = BT(queens)
+        solver.quiet_on()
+        solver.bt_search(prop_FC, max_solutions=None)
+        weights = [1, 2, 3, 4, 5, 6, 7, 8]
+        best = min(sum(w * x for w, x in zip(weights, sol)) for sol in solver.solutions)
+        found = list(bb_search(queens, WeightedSum(queens.get_all_vars(), weights), prop_GAC, ord_dom_ddeg))
+        ok = ok and found[-1][0] == best and found[-1][1] in solver.solutions
+        ok = ok and all(a[0] > b[0] for a, b in zip(found, found[1:]))
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed optimization test: got {} colours and {} for queens (best {})".format(
+                values, [value for value, solution in found], best)
+    except Exception:
+        details = "One or more runtime errors occurred while testing optimization: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_async():
+    '''Async solves should give the same answers as blocking ones, leave
+       the event loop running and stop when cancelled'''
+    score = 0
+    details = ''
+    try:
+        async def run():
+            ticks = [0]
+            async def ticker():
+                while True:
+                    await asyncio.sleep(0.001)
+                    ticks[0] += 1
+            clock = asyncio.create_task(ticker())
+
+            model = compile_csp(nQueens(8))
+            queries = [{'Q1': val} for val in range(1, 9)]
+            answers = await asyncio.gather(*[compiled_solve_async(model, q) for q in queries])
+            ok = answers == [solve_model(model, q) for q in queries]
+
+            slow = asyncio.create_task(compiled_solve_async(nQueens(28), prop='BT', var_ord='static'))
+            await asyncio.sleep(0.05)
+            before = ticks[0]
+            await asyncio.sleep(0.1)
+            ok = ok and ticks[0] > before and not slow.done()
+            slow.cancel()
+            try:
+                await slow
+                ok = False
+            except asyncio.CancelledError:
+                pass
+
+            solver = BT(nQueens(6))
+            solver.quiet_on()
+            ok = ok and await bt_search_async(solver, prop_FC, max_solutions=None) == True
+            ok = ok and len(solver.solutions) == 4
+
+            solver = BT(nQueens(13))
+            solver.quiet_on()
+            search = asyncio.create_task(bt_search_async(solver, prop_BT, max_solutions=None))
+            await asyncio.sleep(0.05)
+            search.cancel()
+            try:
+                await search
+                ok = False
+            except asyncio.CancelledError:
+                ok = ok and solver.aborted
+            clock.cancel()
+            return ok
+
+        if asyncio.run(run()):
+            score = 1
+        else:
+            details = "Failed async test: wrong answers, blocked event loop or cancellation ignored"
+    except Exception:
+        details = "One or more runtime errors occurred while testing async solving: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_tracer():
+    '''The trace should record every decision and backtrack of the
+       search as JSON lines and respect the depth and variable filters'''
+    score = 0
+    details = ''
+    try:
+        out = io.StringIO()
+        solver = BT(nQueens(6))
+        solver.quiet_on()
+        solver.add_monitor(Tracer(out, buffer_size=5))
+        solver.bt_search(prop_FC, ord_dom_ddeg)
+        events = [json.loads(line) for line in out.getvalue().splitlines()]
+        kinds = [e['e'] for e in events]
+        ok = kinds[0] == 'start' and kinds[-2:] == ['solution', 'end'] and events[-1]['status'] == True
+        ok = ok and kinds.count('assign') == solver.nDecisions
+        ok = ok and kinds.count('assign') - kinds.count('backtrack') == 6
+        ok = ok and sum(len(e['pruned']) for e in events if 'pruned' in e) == solver.nPrunings
+
+        out = io.StringIO()
+        solver = BT(nQueens(6))
+        solver.quiet_on()
+        solver.trace_on(out, depth=2, vars=['Q1', 'Q2'])
+        solver.bt_search(prop_FC)
+        solver.trace_off()
+        events = [json.loads(line) for line in out.getvalue().splitlines()]
+        ok = ok and all(e['d'] <= 2 for e in events) and not solver.monitors
+        ok = ok and all(e['var'] in ('Q1', 'Q2') for e in events if 'var' in e)
+        ok = ok and all(x[0] in ('Q1', 'Q2') for e in events if 'pruned' in e for x in e['pruned'])
+
+        #a later search starts over at depth 0, its assumptions included
+        csp = nQueens(6)
+        out = io.StringIO()
+        solver = BT(csp)
+        solver.quiet_on()
+        solver.trace_on(out, depth=0)
+        solver.bt_search(prop_FC)
+        first = len(out.getvalue().splitlines())
+        solver.bt_search(prop_FC, assumptions=[(csp.get_all_vars()[0], 2)])
+        events = [json.loads(line) for line in out.getvalue().splitlines()[first:]]
+        ok = ok and [e['e'] for e in events][:2] == ['start', 'prune'] and \
+             all(e['d'] == 0 for e in events)
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed tracer test: events missing, miscounted or not filtered"
+    except Exception:
+        details = "One or more runtime errors occurred while testing the tracer: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_dh():
+    '''ord_dh and ord_dom_ddeg should follow the dynamic degrees of the
+       CSP's own constraints through assignments, never return an
+       assigned variable and break ties by domain size'''
+    score = 0
+    details = ''
+    try:
+        a = Variable('A', [1, 2, 3])
+        b = Variable('B', [1, 2, 3])
+        c = Variable('C', [1, 2])
+        d = Variable('D', [1, 2, 3])
+        csp = CSP('DH', [a, b, c, d])
+        for x, y in ((a, b), (a, c), (a, d), (b, c)):
+            con = Constraint('C({},{})'.format(x.name, y.name), [x, y])
+            con.add_satisfying_tuples([(i, j) for i in x.domain() for j in y.domain() if i != j])
+            csp.add_constraint(con)
+
+        #another CSP over the same variables adds constraints on D only
+        other = CSP('Other', [a, b, c, d])
+        for x in (a, b, c):
+            con = Constraint('C(D,{})'.format(x.name), [d, x])
+            con.add_satisfying_tuples([(i, j) for i in d.domain() for j in x.domain()])
+            other.add_constraint(con)
+
+        degrees = [dyn_degree(csp, v) for v in (a, b, c, d)]
+        ok = degrees == [3, 2, 2, 1] and ord_dh(csp) is a and ord_dh(other) is d
+        a.assign(1)
+        ok = ok and [dyn_degree(csp, v) for v in (b, c, d)] == [1, 1, 0]
+        ok = ok and ord_dh(csp) is c        #B and C tie, C has the smaller domain
+        b.assign(2)
+        ok = ok and ord_dh(csp) is c and ord_dom_ddeg(csp) is c
+        b.unassign()
+        a.unassign()
+        ok = ok and [dyn_degree(csp, v) for v in (a, b, c, d)] == degrees
+        for v in (a, b, c):
+            v.assign(1)
+        ok = ok and ord_dh(csp) is d and ord_dom_ddeg(csp) is d
+        for v in (a, b, c):
+            v.unassign()
+        ok = ok and [v.ddeg for v in (a, b, c)] == [4, 3, 3]
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed degree heuristic test: degrees or chosen variables don't match"
+    except Exception:
+        details = "One or more runtime errors occurred while testing the degree heuristic: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_sup_counts_repeat():
+    '''Cached support counts should stay exact across repeated searches
+       and compiled_solve on the same CSP (checked with all variables
+       unassigned)'''
+    score = 0
+    details = ''
+    try:
+        def exact(csp):
+            for c in csp.get_all_cons():
+                if c.sup_count is None:
+                    continue
+                counts = [[0] * len(row) for row in c.sup_count]
+                for t in c.code_tuples():
+                    if c.tuple_is_valid(t):
+                        for i, a in enumerate(t):
+                            counts[i][a] += 1
+                if counts != c.sup_count:
+                    return False
+            return True
+
+        csp = nQueens(5)
+        ok = True
+        for prop in [prop_FC, prop_GAC, prop_FC]:
+            solver = BT(csp)
+            solver.quiet_on()
+            ok = ok and solver.bt_search(prop, ord_dom_ddeg, val_lcv) == True
+            for v in csp.get_all_vars():
+                v.unassign()
+            ok = ok and exact(csp)
+        ok = ok and compiled_solve(csp, 'FC')
+        for v in csp.get_all_vars():
+            v.unassign()
+        ok = ok and exact(csp)
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed support count test: cached counts went stale between searches"
+    except Exception:
+        details = "One or more runtime errors occurred while testing repeated searches: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_impact_activity():
+    '''Impact and activity statistics should follow known propagations,
+       persist across searches and leave the solution count unchanged'''
+    score = 0
+    details = ''
+    try:
+        a = Variable('A', [1, 2, 3])
+        b = Variable('B', [1, 2, 3])
+        ne = Constraint('C(A,B)', [a, b])
+        ne.add_satisfying_tuples([(i, j) for i in range(1, 4) for j in range(1, 4) if i != j])
+        csp = CSP('Impact', [a, b])
+        csp.add_constraint(ne)
+
+        ibs = ImpactHeuristic()
+        act = ActivityHeuristic(decay=0.5)
+        a.assign(1)
+        status, prunings = prop_FC(csp, a)     #prunes B=1
+        ibs.propagated(csp, a, 1, status, prunings)
+        act.propagated(csp, a, 1, status, prunings)
+        #the space went from 3 * 3 to 1 * 2: impact 1 - 2/9
+        ok = abs(ibs.get_impact(a, 1) - 7 / 9) < 1e-9
+        ok = ok and act.activity == {b: 1.0} and act.val_activity[(a, 1)] == [1, 1]
+        ibs.propagated(csp, a, 1, False, [])
+        act.propagated(csp, a, 1, False, [])
+        ok = ok and abs(ibs.get_impact(a, 1) - (7 / 9 + 1) / 2) < 1e-9
+        ok = ok and act.activity == {b: 1.0, a: 2.0} and act.val_activity[(a, 1)] == [0.5, 2]
+        for var, val in prunings:
+            var.unprune_value(val)
+        a.unassign()
+
+        #statistics carry over to a second search of the same problem,
+        #and learning them never changes the solutions found
+        for monitor in (ImpactHeuristic(), ActivityHeuristic()):
+            queens = nQueens(6)
+            counts = []
+            samples = []
+            for run in range(2):
+                solver = BT(queens)
+                solver.quiet_on()
+                solver.add_monitor(monitor)
+                solver.bt_search(prop_FC, monitor.var_ord, monitor.val_ord, max_solutions=None)
+                counts.append(len(solver.solutions))
+                table = monitor.impact if isinstance(monitor, ImpactHeuristic) else monitor.val_activity
+                samples.append({key: n for key, (avg, n) in table.items()})
+            ok = ok and counts == [4, 4]
+            ok = ok and all(samples[1].get(key, 0) >= n for key, n in samples[0].items())
+            ok = ok and sum(samples[1].values()) > sum(samples[0].values())
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed impact/activity test: statistics or solution counts don't match"
+    except Exception:
+        details = "One or more runtime errors occurred while testing impact/activity: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_batch():
+    '''solve_board should solve the sample board, and solve_stream should
+       report unreadable lines as errors and go on with the others'''
+    score = 0
+    details = ''
+    try:
+        board = (3, [(3,[(1,1), (2,1)],'+'),(1, [(1,2)], '?'), (8, [(1,3), (2,3), (2,2)], "+"), (3, [(3,1)], '?'), (3, [(3,2), (3,3)], "+")])
+        result = cagey_batch.solve_board(board, prop='GAC', var_ord='dom_wdeg')
+        solved = result['status'] == 'solved' and result['grid'] == [[2, 1, 3], [1, 3, 2], [3, 2, 1]]
+        solved = solved and len(result['ops']) == 5
+
+        lines = [json.dumps({'id': 'good', 'board': cagey_batch.board_to_json(board)}),
+                 '{"id": "cut", "board": [3, ',
+                 '',
+                 json.dumps({'id': 'noboard'}),
+                 json.dumps([3]),
+                 json.dumps(cagey_batch.board_to_json(board))]
+        out = io.StringIO()
+        count = cagey_batch.solve_stream(io.StringIO('\n'.join(lines) + '\n'), out, workers=1)
+        results = dict((r['id'], r) for r in map(json.loads, out.getvalue().splitlines()))
+        streamed = count == 5 and sorted(results, key=str) == [1, 3, 4, 'good', 'noboard']
+        streamed = streamed and results['good']['grid'] == result['grid'] and results[4]['status'] == 'solved'
+        streamed = streamed and all(results[i]['status'] == 'error' and results[i]['error']
+                                    for i in (1, 3, 'noboard'))
+        if solved and streamed:
+            score = 1
+        else:
+            details = "Failed batch test: results don't match expected results"
+    except Exception:
+        details = "One or more runtime errors occurred while testing batch solving: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_generator():
+    '''Generated boards should be valid cagings of a Latin square, cages
+       with no usable operator should fall back to '+', and the unique
+       option should only give boards with a single solution'''
+    score = 0
+    details = ''
+    try:
+        square = [[3, 2, 1], [2, 1, 3], [1, 3, 2]]
+        cells = [(1, 1), (1, 2)]
+        rng = random.Random(0)
+        fallback = all(cage_clue(cells, square, rng, ops) == (5, cells, op)
+                       for ops, op in [({'/': 1}, '+'), ({'?': 1}, '?'), ({'/': 1, '?': 0}, '+')]
+                       for repeat in range(5))
+        mixed = [cage_clue(cells, square, rng, {'/': 1, '?': 1}) for repeat in range(20)]
+        fallback = fallback and set((value, op) for value, cage, op in mixed) == set([(5, '?')])
+
+        valid = True
+        for n, seed in [(4, 0), (5, 1), (6, 2), (7, 3)]:
+            board, square = generate_board(n, seed)
+            symbols = list(range(1, n+1))
+            valid = valid and all(sorted(row) == symbols for row in square) and \
+                    all(sorted(col) == symbols for col in zip(*square))
+            covered = [cell for value, cage, op in board[1] for cell in cage]
+            valid = valid and sorted(covered) == [(r, c) for r in range(1, n+1) for c in range(1, n+1)]
+            for value, cage, op in board[1]:
+                vals = [square[r-1][c-1] for r, c in cage]
+                ops = CAGE_OPS if op == '?' else [op]
+                valid = valid and any(cagey_check(value, vals + [o]) for o in ops)
+                connected = set(cage[:1])
+                for repeat in cage:
+                    connected |= set(cell for cell in cage for r, c in connected
+                                     if abs(cell[0] - r) + abs(cell[1] - c) == 1)
+                valid = valid and connected == set(cage)
+
+        unique = True
+        for seed in range(3):
+            board, square = generate_board(4, seed, unique=True)
+            found, grids = cagey_unique(board)
+            unique = unique and found and grids == [sum(square, [])]
+
+        if fallback and valid and unique:
+            score = 1
+        else:
+            details = "Failed generator test: boards or operator fallback don't match expected results"
+    except Exception:
+        details = "One or more runtime errors occurred while testing the generator: %r" % traceback.format_exc()
+
+    return score, details
+
+def grid_solutions(csp, var_array, n, propagator=prop_GAC):
+    '''All solutions of csp as tuples of the n*n cell values'''
+    solver = BT(csp)
+    solver.quiet_on()
+    solver.bt_search(propagator, max_solutions=None, distinct_on=var_array[:n*n])
+    index = dict((var, i) for i, var in enumerate(csp.vars))
+    return [tuple(sol[index[var]] for var in var_array[:n*n]) for sol in solver.solutions]
+
+def test_latin_soundness():
+    '''Channeling constraints should keep the solutions of a grid, and
+       symmetry breaking should keep exactly one grid of every class of
+       grids that differ by a renaming of values and an order of rows 2..n'''
+    score = 0
+    details = ''
+    try:
+        def canonical(grid, n):
+            rows = [grid[r*n:(r+1)*n] for r in range(n)]
+            rename = dict((v, i+1) for i, v in enumerate(rows[0]))
+            rows = [tuple(rename[v] for v in row) for row in rows]
+            return sum([rows[0]] + sorted(rows[1:]), ())
+
+        ok = True
+        for n in (3, 4):
+            plain = grid_solutions(*binary_ne_grid((n, [])), n)
+            ok = ok and len(plain) == len(set(plain)) == {3: 12, 4: 576}[n]
+            for model in (binary_ne_grid, nary_ad_grid):
+                if model == binary_ne_grid or n == 3:   #n-ary tables make GAC slow
+                    ok = ok and sorted(grid_solutions(*model((n, []), redundant=True), n)) == sorted(plain)
+                broken = grid_solutions(*model((n, []), symmetry_breaking=True), n)
+                ok = ok and len(broken) == len(set(broken))
+                ok = ok and set(broken) == set(canonical(grid, n) for grid in plain)
+            broken = grid_solutions(*cagey_csp_model((n, []), redundant=True, symmetry_breaking=True), n)
+            ok = ok and set(broken) == set(canonical(grid, n) for grid in plain)
+
+        #cages tell values and rows apart, so symmetry breaking is skipped
+        board = (3, [(3,[(1,1), (2,1)],'+'),(1, [(1,2)], '?'), (8, [(1,3), (2,3), (2,2)], "+"), (3, [(3,1)], '?'), (3, [(3,2), (3,3)], "+")])
+        expected = [(2, 1, 3, 1, 3, 2, 3, 2, 1)]
+        for options in ({}, {'redundant': True}, {'symmetry_breaking': True},
+                        {'redundant': True, 'symmetry_breaking': True}):
+            ok = ok and grid_solutions(*cagey_csp_model(board, **options), 3) == expected
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed Latin soundness test: solution sets don't match expected results"
+    except Exception:
+        details = "One or more runtime errors occurred while testing channeling/symmetry breaking: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_prune_domains():
+    '''Pruning cell domains up front should only shrink domains and cage
+       tables, and should keep the solutions of the board'''
+    score = 0
+    details = ''
+    try:
+        boards = [(3, [(3,[(1,1), (2,1)],'+'),(1, [(1,2)], '?'), (8, [(1,3), (2,3), (2,2)], "+"), (3, [(3,1)], '?'), (3, [(3,2), (3,3)], "+")])]
+        boards += [generate_board(n, seed)[0] for n, seed in [(4, 3), (4, 4), (5, 5), (5, 6)]]
+        ok = True
+        shrunk = False
+        for board in boards:
+            n = board[0]
+            full, full_vars = cagey_csp_model(board)
+            pruned, pruned_vars = cagey_csp_model(board, prune_domains=True)
+            for var, small in zip(full_vars[:n*n], pruned_vars[:n*n]):
+                ok = ok and var.name == small.name and set(small.domain()) <= set(var.domain())
+                shrunk = shrunk or small.domain_size() < var.domain_size()
+            tables = dict((c.name, c.sat_tuples) for c in full.get_all_cons())
+            for c in pruned.get_all_cons():
+                ok = ok and set(c.sat_tuples) <= set(tables[c.name])
+            ok = ok and sorted(grid_solutions(full, full_vars, n)) == \
+                        sorted(grid_solutions(pruned, pruned_vars, n))
+
+        if ok and shrunk:
+            score = 1
+        else:
+            details = "Failed domain pruning test: pruned model doesn't match the unpruned one"
+    except Exception:
+        details = "One or more runtime errors occurred while testing domain pruning: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_model_cache():
+    '''A cached model should load back identical to the built one, and
+       models that cannot be identified or stored, or whose cache cannot
+       be written, should be built uncached'''
+    score = 0
+    details = ''
+    try:
+        def describe(csp, var_array):
+            return ([(v.name, v.domain(), v.get_assigned_value()) for v in var_array],
+                    [(c.name, [v.name for v in c.get_scope()], sorted(c.sat_tuples)) for c in csp.get_all_cons()])
+
+        def local_builder(board):
+            return binary_ne_grid(board)
+
+        board = generate_board(5, 1)[0]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            csp, var_array = model_cache.cached_model(cagey_csp_model, board, cache_dir, prune_domains=True)
+            files = os.listdir(cache_dir)
+            loaded, loaded_vars = model_cache.cached_model(cagey_csp_model, board, cache_dir, prune_domains=True)
+            same = len(files) == 1 and loaded is not csp and describe(loaded, loaded_vars) == describe(csp, var_array)
+            same = same and grid_solutions(loaded, loaded_vars, 5) == grid_solutions(csp, var_array, 5)
+            same = same and model_cache.model_key(cagey_csp_model, board, {}) != \
+                            model_cache.model_key(cagey_csp_model, board, {'prune_domains': True})
+
+            uncached = model_cache.model_key(cagey_csp_model, board, {'var_ord': ord_mrv}) is None
+            uncached = uncached and model_cache.model_key(local_builder, board, {}) is None
+            grid, grid_vars = model_cache.cached_model(local_builder, board, cache_dir)
+            uncached = uncached and len(grid_vars) == 25 and os.listdir(cache_dir) == files
+
+            x = Variable('X', [(1, 2), (3, 4)])
+            path = os.path.join(cache_dir, 'tuples.cspm')
+            uncached = uncached and model_cache.save_model(path, CSP('Tuples', [x]), [x]) == False
+            uncached = uncached and not os.path.exists(path)
+
+            #a cache that cannot be written still returns the model
+            blocked = os.path.join(cache_dir, 'file')
+            open(blocked, 'w').close()
+            grid, grid_vars = model_cache.cached_model(cagey_csp_model, board, os.path.join(blocked, 'cache'),
+                                                         prune_domains=True)
+            uncached = uncached and describe(grid, grid_vars) == \
+                                    describe(*cagey_csp_model(board, prune_domains=True))
+
+        if same and uncached:
+            score = 1
+        else:
+            details = "Failed model cache test: loaded model differs or an uncacheable model was cached"
+    except Exception:
+        details = "One or more runtime errors occurred while testing the model cache: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_budget_cutoff():
+    '''A search cut off by its budget after finding some, but fewer than
+       max_solutions, solutions should return None and keep them'''
+    score = 0
+    details = ''
+    try:
+        queens = nQueens(6)
+        solver = BT(queens)
+        solver.quiet_on()
+        solver.bt_search(prop_FC, max_solutions=1)
+        first = solver.nDecisions
+        solver.set_limits(max_decisions=first + 1)
+        status = solver.bt_search(prop_FC, max_solutions=2)
+        ok = status is None and solver.aborted and len(solver.solutions) == 1
+        ok = ok and not any(var.is_assigned() for var in queens.vars)
+        solver.set_limits()
+        ok = ok and solver.bt_search(prop_FC, max_solutions=2) == True and len(solver.solutions) == 2
+
+        #a board with two solutions must never look unique when cut off
+        board = generate_board(5, 1)[0]
+        cut = False
+        for budget in range(1, 200):
+            unique, grids = cagey_unique(board, max_decisions=budget)
+            ok = ok and (unique is None or (unique == False and len(grids) == 2))
+            cut = cut or (unique is None and len(grids) == 1)
+            if unique is not None:
+                break
+        ok = ok and cut and unique == False
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed budget cut-off test: a cut-off search didn't return None"
+    except Exception:
+        details = "One or more runtime errors occurred while testing budget cut-offs: %r" % traceback.format_exc()
+
+    return score, details
+
+def test_cancel_reuse():
+    '''A cancel should stop one search only: the solver should solve
+       again afterwards, with its limits still in force'''
+    score = 0
+    details = ''
+    try:
+        solver = BT(nQueens(8))
+        solver.quiet_on()
+        solver.cancel()
+        ok = solver.bt_search(prop_FC) is None and solver.aborted
+        ok = ok and solver.bt_search(prop_FC) == True and not solver.limited
+        solver.set_limits(max_decisions=3)
+        solver.cancel()
+        ok = ok and solver.bt_search(prop_FC) is None and solver.limited
+        ok = ok and solver.bt_search(prop_FC) is None and solver.nDecisions == 3
+        solver.set_limits()
+        ok = ok and solver.bt_search(prop_FC) == True
+
+        async def run():
+            solver = BT(nQueens(13))
+            solver.quiet_on()
+            search = asyncio.create_task(bt_search_async(solver, prop_BT, max_solutions=None))
+            await asyncio.sleep(0.05)
+            search.cancel()
+            try:
+                await search
+                return False
+            except asyncio.CancelledError:
+                pass
+            return await bt_search_async(solver, prop_FC, ord_dom_ddeg) == True
+
+        async def run_late():
+            #cancel once the search thread is done but before the task resumes
+            solver = BT(nQueens(6))
+            solver.quiet_on()
+            search = asyncio.create_task(bt_search_async(solver, prop_FC))
+            await asyncio.sleep(0)
+            time.sleep(0.5)
+            search.cancel()
+            try:
+                await search
+            except asyncio.CancelledError:
+                pass
+            return not solver.cancelled and solver.bt_search(prop_FC) == True
+
+        ok = ok and asyncio.run(run())
+        ok = ok and asyncio.run(run_late())
+
+        if ok:
+            score = 1
+        else:
+            details = "Failed cancel test: a solver stayed cancelled or lost its limits"
+    except Exception:
+        details = "One or more runtime errors occurred while testing solver reuse after a cancel: %r" % traceback.format_exc()
+
+    return score, details
+
 # Run Tests
 def main(stu_propagators=None):
-    tests = 7
+    tests = 35
     total_score = 0
 
     if stu_propagators == None:
@@ -386,6 +1559,174 @@ def main(stu_propagators=None):
             print(e)
             print(traceback.format_exc())
 
+        print("---starting test_dom_wdeg---")
+        score,details = test_dom_wdeg()
+        total_score += score
+        print(details)
+        print("---finished test_dom_wdeg---\n")
+
+        print("---starting test_lcv---")
+        score,details = test_lcv()
+        total_score += score
+        print(details)
+        print("---finished test_lcv---\n")
+
+        print("---starting test_cage_tables---")
+        score,details = test_cage_tables()
+        total_score += score
+        print(details)
+        print("---finished test_cage_tables---\n")
+
+        print("---starting test_cagey_bitmask---")
+        score,details = test_cagey_bitmask()
+        total_score += score
+        print(details)
+        print("---finished test_cagey_bitmask---\n")
+
+        print("---starting test_cagey_unique---")
+        score,details = test_cagey_unique()
+        total_score += score
+        print(details)
+        print("---finished test_cagey_unique---\n")
+
+        print("---starting test_min_conflicts---")
+        score,details = test_min_conflicts()
+        total_score += score
+        print(details)
+        print("---finished test_min_conflicts---\n")
+
+        print("---starting test_structural---")
+        score,details = test_structural()
+        total_score += score
+        print(details)
+        print("---finished test_structural---\n")
+
+        print("---starting test_components---")
+        score,details = test_components()
+        total_score += score
+        print(details)
+        print("---finished test_components---\n")
+
+        print("---starting test_benchmark---")
+        score,details = test_benchmark()
+        total_score += score
+        print(details)
+        print("---finished test_benchmark---\n")
+
+        print("---starting test_compiled---")
+        score,details = test_compiled()
+        total_score += score
+        print(details)
+        print("---finished test_compiled---\n")
+
+        print("---starting test_value_codes---")
+        score,details = test_value_codes()
+        total_score += score
+        print(details)
+        print("---finished test_value_codes---\n")
+
+        print("---starting test_shared_model---")
+        score,details = test_shared_model()
+        total_score += score
+        print(details)
+        print("---finished test_shared_model---\n")
+
+        print("---starting test_snapshots---")
+        score,details = test_snapshots()
+        total_score += score
+        print(details)
+        print("---finished test_snapshots---\n")
+
+        print("---starting test_incremental---")
+        score,details = test_incremental()
+        total_score += score
+        print(details)
+        print("---finished test_incremental---\n")
+
+        print("---starting test_phase_saving---")
+        score,details = test_phase_saving()
+        total_score += score
+        print(details)
+        print("---finished test_phase_saving---\n")
+
+        print("---starting test_optimize---")
+        score,details = test_optimize()
+        total_score += score
+        print(details)
+        print("---finished test_optimize---\n")
+
+        print("---starting test_async---")
+        score,details = test_async()
+        total_score += score
+        print(details)
+        print("---finished test_async---\n")
+
+        print("---starting test_tracer---")
+        score,details = test_tracer()
+        total_score += score
+        print(details)
+        print("---finished test_tracer---\n")
+
+        print("---starting test_dh---")
+        score,details = test_dh()
+        total_score += score
+        print(details)
+        print("---finished test_dh---\n")
+
+        print("---starting test_sup_counts_repeat---")
+        score,details = test_sup_counts_repeat()
+        total_score += score
+        print(details)
+        print("---finished test_sup_counts_repeat---\n")
+
+        print("---starting test_impact_activity---")
+        score,details = test_impact_activity()
+        total_score += score
+        print(details)
+        print("---finished test_impact_activity---\n")
+
+        print("---starting test_batch---")
+        score,details = test_batch()
+        total_score += score
+        print(details)
+        print("---finished test_batch---\n")
+
+        print("---starting test_generator---")
+        score,details = test_generator()
+        total_score += score
+        print(details)
+        print("---finished test_generator---\n")
+
+        print("---starting test_latin_soundness---")
+        score,details = test_latin_soundness()
+        total_score += score
+        print(details)
+        print("---finished test_latin_soundness---\n")
+
+        print("---starting test_prune_domains---")
+        score,details = test_prune_domains()
+        total_score += score
+        print(details)
+        print("---finished test_prune_domains---\n")
+
+        print("---starting test_model_cache---")
+        score,details = test_model_cache()
+        total_score += score
+        print(details)
+        print("---finished test_model_cache---\n")
+
+        print("---starting test_budget_cutoff---")
+        score,details = test_budget_cutoff()
+        total_score += score
+        print(details)
+        print("---finished test_budget_cutoff---\n")
+
+        print("---starting test_cancel_reuse---")
+        score,details = test_cancel_reuse()
+        total_score += score
+        print(details)
+        print("---finished test_cancel_reuse---\n")
+
         setTO(0)
 
     except TO_exc: